@@ -0,0 +1,201 @@
+"""Benchmark every stage of the pipeline on synthetic Financial-Sample-shaped data.
+
+    python benchmarks/run.py --sizes 1e3 1e4 1e5 1e6 --out results.json
+    python benchmarks/run.py --sizes 1e5 --compare old.json
+
+Each stage is timed on its own (ingest, dedup groupby, dummies, monthly KPIs, correlation, OLS,
+RandomForest) with its peak RSS. The ingest file is written chunk by chunk, but the other stages
+run on the whole frame in memory: about 1.1 GB of RSS at 1e7 rows, so 1e8 rows (about 9.5 GB for
+the frame alone, plus the working set of dedup/encode) only runs on a machine with 32 GB or more. Results are written as JSON together with the package version
+and git commit, and ``--compare`` prints the time ratio against an earlier result file.
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+import profit_analysis  # noqa: E402
+from profit_analysis import synthetic  # noqa: E402
+from profit_analysis.encoding import encode  # noqa: E402
+from profit_analysis.ingest import load_transactions  # noqa: E402
+from profit_analysis.pipeline import add_ratios, dedup, monthly_sums  # noqa: E402
+from profit_analysis.regression import batched_ols  # noqa: E402
+
+STAGES = ['ingest', 'ingest_cached', 'dedup', 'dummies', 'encode', 'monthly', 'correlation', 'ols', 'random_forest']
+FOREST_ROWS = 200_000  # the forest is fitted on at most this many rows
+
+
+def _status(field):
+    """VmRSS/VmHWM of this process in bytes (Linux), None elsewhere."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def _reset_peak():
+    """Reset the peak RSS so that it measures the next stage only (Linux); False if not possible."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss():
+    peak = _status('VmHWM')
+    if peak is None:  # no /proc, high-water mark of the whole process instead
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    return peak
+
+
+def measure(stage, rows, func):
+    gc.collect()
+    per_stage = _reset_peak()
+    rss_before = _status('VmRSS')
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    rows_out = len(result) if hasattr(result, '__len__') else result if isinstance(result, int) else None
+    return result, {
+        'stage': stage,
+        'rows': rows,
+        'rows_out': rows_out,
+        'seconds': seconds,
+        'peak_rss_mb': _peak_rss() / 2 ** 20,
+        'rss_before_mb': rss_before / 2 ** 20 if rss_before is not None else None,
+        'peak_is_per_stage': per_stage,
+    }
+
+
+def _forest(new_df, seed):
+    from sklearn.ensemble import RandomForestRegressor
+
+    X = new_df.drop(['Profit', 'Year', 'Profit margin'], axis=1)
+    x, y = X.to_codes(), new_df['Profit margin'].to_numpy()
+    if len(y) > FOREST_ROWS:
+        x, y = x[:FOREST_ROWS], y[:FOREST_ROWS]
+    return RandomForestRegressor(n_estimators=100, random_state=10, n_jobs=1).fit(x, y).estimators_
+
+
+def _warm_imports():
+    """Import the lazy dependencies up front, so their import time is not charged to the first size."""
+    import scipy.stats  # noqa: F401
+    import sklearn.ensemble  # noqa: F401
+
+
+def run_size(rows, stages, seed=0, workdir=None):
+    results = []
+    if 'ingest' in stages or 'ingest_cached' in stages:
+        with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+            path = synthetic.write_parquet(os.path.join(tmp, 'transactions.parquet'), rows, seed=seed)  # chunk by chunk
+            cache = os.path.join(tmp, 'cache')
+            if 'ingest' in stages:
+                _, r = measure('ingest', rows, lambda: len(load_transactions(path, cache_dir=cache)))
+                results.append(r)
+            if 'ingest_cached' in stages:
+                load_transactions(path, cache_dir=cache)
+                _, r = measure('ingest_cached', rows, lambda: len(load_transactions(path, cache_dir=cache)))
+                results.append(r)
+
+    df = synthetic.transactions(rows, seed=seed)
+    new_df, r = measure('dedup', rows, lambda: dedup(df))
+    results.append(r)
+    new_df = new_df.drop(['Discount Band', 'Date'], axis=1)
+    del df
+    if 'dummies' in stages:
+        dense, r = measure('dummies', rows, lambda: pd.get_dummies(new_df, columns=['Segment', 'Country', 'Product'],
+                                                                     dtype=int))
+        results.append(r)
+        del dense
+    encoded, r = measure('encode', rows, lambda: encode(new_df, ['Segment', 'Country', 'Product']))
+    results.append(r)
+    encoded['Profit margin'] = (encoded['Profit'] / encoded['Sales']) * 100
+    for stage, func in [
+        ('monthly', lambda: add_ratios(monthly_sums(new_df))),
+        ('correlation', lambda: encoded.corr()),
+        ('ols', lambda: batched_ols(encoded, by=())),
+        ('random_forest', lambda: _forest(encoded, seed)),
+    ]:
+        if stage in stages:
+            _, r = measure(stage, rows, func)
+            results.append(r)
+    return [r for r in results if r['stage'] in stages]
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(current, previous):
+    """Time ratio current/previous per (stage, rows); > 1 is slower."""
+    old = {(r['stage'], r['rows']): r for r in previous['results']}
+    rows = []
+    for r in current['results']:
+        before = old.get((r['stage'], r['rows']))
+        if before:
+            rows.append({'stage': r['stage'], 'rows': r['rows'], 'seconds': r['seconds'],
+                         'previous': before['seconds'], 'ratio': r['seconds'] / before['seconds'],
+                         'peak_rss_mb': r['peak_rss_mb'], 'previous_rss_mb': before['peak_rss_mb']})
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', type=float, default=[1e3, 1e4, 1e5, 1e6],
+                        help='numbers of rows, from 1e3; the in-memory stages hold the whole frame '
+                             '(about 95 bytes per row), so 1e8 needs 32 GB of RAM or more')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='benchmarks/results.json')
+    parser.add_argument('--compare', help='earlier result file to compare with')
+    parser.add_argument('--workdir', help='where to write the temporary ingest files')
+    args = parser.parse_args(argv)
+
+    _warm_imports()
+    results = []
+    for size in args.sizes:
+        for r in run_size(int(size), args.stages, args.seed, args.workdir):
+            print(f"{r['stage']:>14} {r['rows']:>11,} rows {r['seconds']:10.4f} s {r['peak_rss_mb']:10.1f} MB")
+            results.append(r)
+    report = {
+        'version': profit_analysis.__version__,
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(report, json.load(f)).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
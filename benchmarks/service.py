@@ -0,0 +1,111 @@
+"""Latency of the query service under a steady request rate.
+
+    python benchmarks/service.py "Financial Sample.xlsx" --rate 500 --seconds 10
+
+Starts ``profit-analysis serve`` in a subprocess, then sends a mix of KPI, slice and elasticity
+queries at ``--rate`` requests per second over ``--connections`` keep-alive connections, and
+prints the achieved rate and the p50/p99/max latency.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUERIES = [
+    '/kpis', '/kpis?by=Country', '/kpis?by=Segment', '/slice?by=Country', '/slice?by=Product&stat=sum,mean',
+    '/slice?by=Segment&Year=2014', '/slice?by=Country,Product&Month%20Number=12', '/elasticity?by=Segment',
+    '/elasticity?by=Country&optimal=1',
+]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def _request(reader, writer, target):
+    writer.write(f'GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        h = await reader.readline()
+        if h in (b'\r\n', b''):
+            break
+        if h.lower().startswith(b'content-length:'):
+            length = int(h.split(b':')[1])
+    await reader.readexactly(length)
+    return status
+
+
+async def _wait(port, timeout):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            await _request(reader, writer, '/health')
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def load(port, rate, seconds, connections):
+    latencies, errors = [], 0
+    interval = connections / rate  # each connection sends one request per interval
+
+    async def client(i):
+        nonlocal errors
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        start = time.perf_counter() + i * interval / connections  # spread the connections over an interval
+        n = 0
+        while n * interval < seconds:
+            delay = start + n * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            t = time.perf_counter()
+            if await _request(reader, writer, QUERIES[(i + n * connections) % len(QUERIES)]) != 200:
+                errors += 1
+            latencies.append(time.perf_counter() - t)
+            n += 1
+        writer.close()
+
+    t = time.perf_counter()
+    await asyncio.gather(*[client(i) for i in range(connections)])
+    return np.array(latencies) * 1000, errors, time.perf_counter() - t
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', help='transactions file, directory or glob to serve')
+    parser.add_argument('--rate', type=float, default=500, help='requests per second, all connections together')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--connections', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    port = _free_port()
+    server = subprocess.Popen([sys.executable, '-m', 'profit_analysis', 'serve', os.path.abspath(args.path), '--port', str(port)],
+                              cwd=ROOT, stdout=subprocess.DEVNULL)
+    try:
+        asyncio.run(_wait(port, 120))
+        latencies, errors, elapsed = asyncio.run(load(port, args.rate, args.seconds, args.connections))
+    finally:
+        server.terminate()
+        server.wait()
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(f'{len(latencies)} requests in {elapsed:.1f} s ({len(latencies) / elapsed:.0f}/s), {errors} errors')
+    print(f'latency p50 {p50:.2f} ms  p99 {p99:.2f} ms  max {latencies.max():.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
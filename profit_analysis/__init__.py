@@ -0,0 +1,22 @@
+"""Reusable stages of the profit analysis (see profit_analysis_.py for the walkthrough).
+
+The submodules are imported on first use, so ``import profit_analysis`` stays cheap.
+"""
+
+__version__ = '0.1.0'
+
+_EXPORTS = {
+    'load_transactions': 'ingest',
+    'KPIState': 'kpis',
+    'memoize': 'memo',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        import importlib
+
+        return getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,231 @@
+"""Command line entry point: ``profit-analysis kpis|eda|ols|importance|report|store|serve``.
+
+Each stage imports what it needs when it runs: a ``kpis`` run only pulls in pandas (and pyarrow
+for the cache), never statsmodels, scikit-learn or matplotlib.
+"""
+
+import argparse
+import os
+import sys
+
+
+def _where(items):
+    """``--where`` options as {column: values}, the values typed like the column."""
+    import pandas as pd
+
+    from .schema import DATE, DIMENSIONS, NUMERIC, PERIOD
+
+    kinds = {**dict.fromkeys(DIMENSIONS + ['Month Name'], str), **dict.fromkeys(PERIOD, int),
+             **dict.fromkeys(NUMERIC, float), DATE: pd.Timestamp}
+    where = {}
+    for item in items or []:
+        column, sep, values = item.partition('=')
+        if not sep:
+            raise SystemExit(f'--where expects COLUMN=VALUE[,VALUE...], got {item!r}')
+        if column not in kinds:
+            raise SystemExit(f'--where: unknown column {column!r}, expected one of {list(kinds)}')
+        try:
+            where[column] = [kinds[column](v) for v in values.split(',')]
+        except ValueError:
+            raise SystemExit(f'--where: {column} expects {kinds[column].__name__} values, got {values!r}') from None
+    return where
+
+
+def _months(value):
+    months = int(value)
+    if months < 1:
+        raise argparse.ArgumentTypeError(f'expected at least 1 month, got {months}')
+    return months
+
+
+def _load(args):
+    from .store import Store, filter_rows, is_store
+
+    where = _where(args.where)
+    if is_store(args.path):  # only the matching partitions, batches and columns are read
+        return Store(args.path).read(where=where, since=args.since, until=args.until, last=args.last)
+    from .ingest import load_transactions
+
+    df = load_transactions(args.path, use_cache=not args.no_cache, compact=args.compact)
+    return filter_rows(df, where, args.since, args.until, args.last)
+
+
+def _emit(frame, args):
+    if args.out:
+        if args.out.endswith('.json'):
+            frame.to_json(args.out, orient='records', indent=1)
+        else:
+            frame.to_csv(args.out, index=False)
+    elif args.format == 'csv':
+        frame.to_csv(sys.stdout, index=False)
+    elif args.format == 'json':
+        sys.stdout.write(frame.to_json(orient='records') + '\n')
+    else:
+        print(frame.to_string(index=False))
+
+
+def kpis(args):
+    """Gross Sales, Discounts, Sales, COGS, Profit and GPM/COGSM/DR per month."""
+    if args.state:
+        return _kpis_state(args)
+    from .elasticity import period_sums
+    from .pipeline import add_ratios, dedup
+
+    return add_ratios(period_sums(dedup(_load(args)), args.by))
+
+
+def _kpis_state(args):
+    """``kpis`` from the KPI state in --state, after adding the transactions of ``path`` to it."""
+    from .kpis import KPIState
+    from .schema import MONEY, PERIOD
+
+    state = KPIState.open(args.state, args.by)
+    if state.by != list(args.by):
+        raise SystemExit(f'{args.state} holds the KPIs by {state.by}, not by {list(args.by)}')
+    state.update(_load(args))
+    state.save(args.state)
+    sums = state.table.reset_index()[args.by + PERIOD + MONEY + ['DR', 'GPM', 'COGSM']]
+    return sums.sort_values(args.by + PERIOD, ignore_index=True)
+
+
+def eda(args):
+    """Profit (or another measure) rolled up by the given dims, from the cube."""
+    from .cube import Cube
+
+    stats = args.stat.split(',')
+    result = Cube.from_frame(_load(args)).rollup(args.by, args.measure, stats if len(stats) > 1 else stats[0])
+    return result.reset_index()
+
+
+def ols(args):
+    """Profit ~ const + Discounts, for every slice of --by (all of new_df without --by)."""
+    from .memo import memoize
+    from .pipeline import model_frame
+    from .regression import batched_ols
+
+    return memoize(batched_ols, model_frame(_load(args)), x=args.x, y=args.y, by=args.by,
+                   cache=False if args.no_cache else None)
+
+
+def importance(args):
+    """Impurity and permutation importances of the Profit margin forest, one forest per --by value."""
+    from .importance import feature_importances, groups_of
+    from .pipeline import model_frame
+
+    new_df = model_frame(_load(args))
+    X = new_df.drop(['Profit', 'Year', 'Profit margin'], axis=1)
+    groups = groups_of(new_df, args.by) if args.by else None
+    importances, runs = feature_importances(X.to_codes(), new_df['Profit margin'], X.code_columns, groups=groups,
+                                            params={'n_estimators': args.trees}, max_workers=args.workers)
+    print(runs.to_string(index=False), file=sys.stderr)
+    return importances.sort_values(['Group', 'Permutation'], ascending=[True, False])
+
+
+def report(args):
+    """Render every chart to PNG (one folder per --by value)."""
+    from .report import render_reports
+
+    result = render_reports(_load(args), args.out_dir, by=args.by, max_workers=args.workers)
+    print(f"{int(result['Rendered'].sum())} figures rendered, {int((~result['Rendered']).sum())} unchanged",
+          file=sys.stderr)
+    return None
+
+
+def serve(args):
+    """Serve the KPI, slice and elasticity queries over HTTP, reloading when the files change."""
+    from . import service
+
+    service.serve(args.path, args.host, args.port, args.reload_interval, use_cache=not args.no_cache, compact=args.compact)
+
+
+def store(args):
+    """Write the transactions to a store partitioned by Year/Month Number (appending with --append)."""
+    from .ingest import load_transactions
+    from .store import Store, is_store
+
+    df = load_transactions(args.path, use_cache=not args.no_cache)
+    if args.append and is_store(args.out_dir):
+        entries = Store(args.out_dir).append(df)
+    else:
+        entries = Store.write(df, args.out_dir).files
+    print(f'{len(df)} rows written to {len(entries)} partition files in {args.out_dir}', file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='profit-analysis', description=__doc__.splitlines()[0])
+    parser.add_argument('--trace', metavar='FILE', help='append one JSON line per stage (time, rows, memory) to FILE')
+    parser.add_argument('--metrics', metavar='FILE', help='write the stage metrics as OpenMetrics text to FILE')
+    parser.add_argument('--profile', metavar='DIR', help='cProfile the stages, one .prof file per stage in DIR')
+    parser.add_argument('--trace-memory', action='store_true', help='record the tracemalloc peak of each stage')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def command(name, func, by_nargs='*'):
+        p = sub.add_parser(name, help=func.__doc__.splitlines()[0])
+        p.add_argument('path', help='transactions file (xlsx, csv, parquet), a directory or glob of them, or a store')
+        p.add_argument('--by', nargs=by_nargs, default=[] if by_nargs == '*' else None)
+        p.add_argument('--where', action='append', metavar='COLUMN=VALUES', help='keep rows with these values, e.g. '
+                       'Country=Canada,France (repeatable); pushed down to the partitions of a store')
+        p.add_argument('--since', help='first period, YYYY-MM')
+        p.add_argument('--until', help='last period, YYYY-MM')
+        p.add_argument('--last', type=_months, help='only the last N months')
+        p.add_argument('--no-cache', action='store_true', help='parse the file again and recompute, ignore the caches')
+        p.add_argument('--compact', action='store_true', help='load with the compact dtypes (categories, small ints)')
+        p.add_argument('--format', choices=['table', 'csv', 'json'], default='table')
+        p.add_argument('--out', help='write the result to a .csv or .json file')
+        p.set_defaults(func=func)
+        return p
+
+    p = command('kpis', kpis)
+    p.add_argument('--state', metavar='FILE', help='add the transactions of path (only the new ones, e.g. '
+                   "today's export) to the KPI state in FILE, save it and print the KPIs of all of it")
+    p = command('eda', eda)
+    p.add_argument('--measure', default='Profit')
+    p.add_argument('--stat', default='sum', help='count, sum, mean, std or var (comma separated for several)')
+    p = command('ols', ols)
+    p.add_argument('--x', default='Discounts')
+    p.add_argument('--y', default='Profit')
+    p = command('importance', importance, by_nargs='?')
+    p.add_argument('--trees', type=int, default=100)
+    p.add_argument('--workers', type=int, default=None)
+    p = command('report', report, by_nargs='?')
+    p.add_argument('out_dir')
+    p.add_argument('--workers', type=int, default=None)
+    p = sub.add_parser('store', help=store.__doc__.splitlines()[0])
+    p.add_argument('path', help='transactions file, directory or glob')
+    p.add_argument('out_dir')
+    p.add_argument('--append', action='store_true', help='add to an existing store (e.g. a new month)')
+    p.add_argument('--no-cache', action='store_true', help='parse the files again, ignore the Arrow cache')
+    p.set_defaults(func=store)
+    p = sub.add_parser('serve', help=serve.__doc__.splitlines()[0])
+    p.add_argument('path', help='transactions file, directory or glob (watched for changes)')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=8050)
+    p.add_argument('--reload-interval', type=float, default=5.0, help='seconds between checks of the files, 0 for never')
+    p.add_argument('--no-cache', action='store_true', help='parse the files again, ignore the Arrow cache')
+    p.add_argument('--compact', action='store_true', help='load with the compact dtypes (categories, small ints)')
+    p.set_defaults(func=serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    from . import instrument
+
+    if args.trace or args.metrics or args.profile or args.trace_memory:
+        instrument.enable(args.trace, args.metrics, profile=bool(args.profile), profile_dir=args.profile,
+                          trace_memory=args.trace_memory)
+    try:
+        with instrument.stage('cli_' + args.command):
+            result = args.func(args)
+        if result is not None:
+            try:
+                _emit(result, args)
+            except BrokenPipeError:  # e.g. piped into head
+                os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    finally:
+        instrument.flush()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""Mergeable covariance/correlation accumulator (Welford / Chan et al. pairwise update).
+
+The state is the row count ``n``, the column means and the co-moment matrix
+``M2 = sum((x - mean)(x - mean)')``. A batch is reduced to the same three things, and two
+states combine with::
+
+    delta = mean_b - mean_a
+    mean  = mean_a + delta * n_b / n
+    M2    = M2_a + M2_b + outer(delta, delta) * n_a * n_b / n
+
+so the accumulator can be fed chunk by chunk, merged across workers, and extended with the
+rows of a new month at O(k²) per merge, without going back to the old rows. The deviations
+are taken from the means before the products, so there is no cancellation of large raw sums.
+
+``corr()`` is the Pearson matrix of ``new_df.corr()``; ``corr_with('Profit')`` is its Profit column.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from .encoding import EncodedFrame
+from .ingest import read_cache, write_cache
+
+
+def _moments(data):
+    """``(columns, n, mean, M2)`` of a batch: an EncodedFrame, or the numeric columns of a DataFrame.
+
+    Rows with a missing value are left out of a DataFrame batch (pandas' corr is pairwise instead).
+    """
+    if isinstance(data, EncodedFrame):
+        x = data.to_csr(center=True)
+        n = x.shape[0]
+        sums = np.asarray(x.sum(axis=0)).ravel()
+        m2 = (x.T @ x).toarray() - np.outer(sums, sums) / max(n, 1)
+        mean = sums / max(n, 1)
+        k = data.numeric.shape[1]
+        mean[:k] += data.numeric.to_numpy(dtype='float64').mean(axis=0) if n else 0
+        return data.columns, n, mean, m2
+    numeric = data.select_dtypes(include=['number', 'bool'])
+    values = numeric.to_numpy(dtype='float64')
+    values = values[~np.isnan(values).any(axis=1)]
+    n = len(values)
+    mean = values.mean(axis=0) if n else np.zeros(values.shape[1])
+    centered = values - mean
+    return list(numeric.columns), n, mean, centered.T @ centered
+
+
+class CoMoments:
+    """Running means and co-moments of a set of columns."""
+
+    def __init__(self, columns=(), n=0, mean=None, m2=None):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.n = n
+        # copies: a loaded state is memory-mapped read-only and merge() updates in place
+        self.mean = np.zeros(k) if mean is None else np.array(mean, dtype='float64')
+        self.m2 = np.zeros((k, k)) if m2 is None else np.array(m2, dtype='float64')
+
+    @classmethod
+    def from_batch(cls, data):
+        return cls(*_moments(data))
+
+    def _align(self, columns):
+        """Add the ``columns`` not seen yet, as all-zero columns over the rows seen so far.
+
+        That is exact for one-hot columns: a category that first appears in a later month
+        was 0 in every earlier row.
+        """
+        new = [c for c in columns if c not in self.columns]
+        if not new:
+            return
+        k = len(self.columns)
+        self.columns += new
+        self.mean = np.concatenate([self.mean, np.zeros(len(new))])
+        m2 = np.zeros((len(self.columns), len(self.columns)))
+        m2[:k, :k] = self.m2
+        self.m2 = m2
+
+    def merge(self, other):
+        """Add the rows summarised by ``other`` (another CoMoments) to this one, in place."""
+        if other.n == 0:
+            self._align(other.columns)
+            return self
+        self._align(other.columns)
+        pos = [self.columns.index(c) for c in other.columns]
+        mean_b = np.zeros(len(self.columns))
+        mean_b[pos] = other.mean
+        m2_b = np.zeros_like(self.m2)
+        m2_b[np.ix_(pos, pos)] = other.m2
+        n = self.n + other.n
+        delta = mean_b - self.mean
+        self.m2 += m2_b + np.outer(delta, delta) * (self.n * other.n / n)
+        self.mean += delta * (other.n / n)
+        self.n = n
+        return self
+
+    def update(self, data):
+        """Add a batch of rows (EncodedFrame or DataFrame); the cost beyond reading the batch is O(k²)."""
+        return self.merge(CoMoments.from_batch(data))
+
+    def cov(self, ddof=1):
+        cov = self.m2 / (self.n - ddof) if self.n > ddof else np.full_like(self.m2, np.nan)
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def corr(self):
+        """Pearson correlation matrix; NaN for a constant column, like pandas."""
+        std = np.sqrt(np.diag(self.m2))
+        scale = np.outer(std, std)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self.m2 / scale
+        corr[scale == 0] = np.nan
+        np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+        return pd.DataFrame(np.clip(corr, -1, 1), index=self.columns, columns=self.columns)
+
+    def corr_with(self, column='Profit'):
+        """One column of ``corr()`` (``correlation_matrix['Profit']``) in O(k)."""
+        j = self.columns.index(column)
+        std = np.sqrt(np.diag(self.m2))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self.m2[:, j] / (std * std[j])
+        corr[std * std[j] == 0] = np.nan
+        corr[j] = 1.0 if std[j] > 0 else np.nan
+        return pd.Series(np.clip(corr, -1, 1), index=self.columns, name=column)
+
+    def to_frame(self):
+        frame = pd.DataFrame(self.m2, columns=self.columns)
+        frame.insert(0, 'mean', self.mean)
+        frame.insert(0, 'n', self.n)
+        frame.insert(0, 'column', self.columns)
+        return frame
+
+    @classmethod
+    def from_frame(cls, frame):
+        columns = list(frame['column'])
+        n = int(frame['n'].iloc[0]) if len(frame) else 0
+        return cls(columns, n, frame['mean'].to_numpy(), frame[columns].to_numpy())
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_frame(read_cache(path))
+
+    def save(self, path):
+        write_cache(self.to_frame(), path)
+
+    @classmethod
+    def open(cls, path):
+        """Load the accumulator at ``path`` if it exists, otherwise start an empty one."""
+        return cls.load(path) if os.path.exists(path) else cls()
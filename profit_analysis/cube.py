@@ -0,0 +1,123 @@
+"""Pre-aggregated cube for Segment x Country x Product x Month questions.
+
+The EDA section answers every question (total/mean/std/count of Profit by Country, Product,
+Segment...) by rescanning the raw transactions. The cube stores count, sum and sum of squares
+per dimension combination once; any roll-up is then a ``np.bincount`` over the cube cells.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .instrument import stage
+from .schema import MONEY
+
+CUBE_DIMS = ['Segment', 'Country', 'Product', 'Year', 'Month Number']
+CUBE_MEASURES = ['Units Sold'] + MONEY
+STATS = ['count', 'sum', 'mean', 'std', 'var']
+
+
+class Cube:
+    """count/sum/sum of squares of each measure per cell (one cell per dimension combination)."""
+
+    def __init__(self, dims, levels, codes, n, sums, sumsq):
+        self.dims = list(dims)
+        self.levels = levels  # dim -> Index of its values
+        self.codes = codes  # dim -> int array, one code per cell
+        self.n = n
+        self.sums = sums  # measure -> float array, one value per cell
+        self.sumsq = sumsq
+        self._groups = {}
+
+    @classmethod
+    def from_frame(cls, df, dims=CUBE_DIMS, measures=CUBE_MEASURES):
+        dims, measures = list(dims), list(measures)
+        values = df[measures].astype('float64')
+        squares = (values ** 2).add_suffix('^2')
+        with stage('cube', rows_in=df) as s:
+            g = pd.concat([df[dims], values, squares], axis=1).groupby(dims, observed=True)
+            n = g.size()
+            s.rows_out = n
+            totals = g.sum()
+        index = n.index if len(dims) > 1 else pd.MultiIndex.from_arrays([n.index])
+        levels = {d: index.levels[i] for i, d in enumerate(dims)}
+        codes = {d: np.asarray(index.codes[i], dtype=np.intp) for i, d in enumerate(dims)}
+        return cls(dims, levels, codes, n.to_numpy(dtype='float64'),
+                   {m: totals[m].to_numpy() for m in measures},
+                   {m: totals[m + '^2'].to_numpy() for m in measures})
+
+    def __len__(self):
+        return len(self.n)
+
+    def _group(self, by):
+        """Group id of every cell for the ``by`` dims, plus the index of the groups (cached).
+
+        Only the combinations present in the cube get an id, so the size follows the populated
+        cells and not the product of the cardinalities (thousands of SKUs x countries x months).
+        """
+        if by not in self._groups:
+            if len(by) == 1:
+                key, index = self.codes[by[0]], self.levels[by[0]]
+            elif by:
+                codes = [self.codes[d] for d in by]
+                shape = tuple(len(self.levels[d]) for d in by)
+                if np.prod(shape, dtype='float64') < 2 ** 62:
+                    groups, key = np.unique(np.ravel_multi_index(codes, shape), return_inverse=True)
+                    group_codes = np.unravel_index(groups, shape)
+                else:  # too many combinations for one int64 key
+                    group_codes, key = np.unique(np.stack(codes), axis=1, return_inverse=True)
+                key = key.ravel()
+                index = pd.MultiIndex(levels=[self.levels[d] for d in by], codes=list(group_codes), names=list(by))
+            else:
+                key = np.zeros(len(self), dtype=np.intp)
+                index = pd.Index(['All'])
+            self._groups[by] = (key, index)
+        return self._groups[by]
+
+    def _mask(self, where):
+        mask = np.ones(len(self), dtype=bool)
+        for dim, wanted in where.items():
+            wanted = [wanted] if np.isscalar(wanted) else list(wanted)
+            hit = np.isin(np.arange(len(self.levels[dim])), self.levels[dim].get_indexer(wanted))
+            mask &= hit[self.codes[dim]]
+        return mask
+
+    def rollup(self, by=(), measure='Profit', stats='sum', where=None):
+        """Aggregate ``measure`` over the ``by`` dims, restricted to the cells matching ``where``.
+
+        ``stats`` is one of count/sum/mean/std/var (std/var with ddof=1, like pandas) or a list of
+        them. With a single stat a Series named ``measure`` is returned, so
+        ``cube.rollup('Country', 'Profit', 'mean')`` is ``df.groupby('Country')['Profit'].mean()``.
+        ``where`` maps a dim to a value or a list of values, e.g. ``{'Year': 2014, 'Country': ['Canada']}``.
+        """
+        by = (by,) if isinstance(by, str) else tuple(by)
+        key, index = self._group(by)
+        n, s, ss = self.n, self.sums[measure], self.sumsq[measure]
+        if where:
+            mask = self._mask(where)
+            key, n, s, ss = key[mask], n[mask], s[mask], ss[mask]
+        size = len(index)
+        n = np.bincount(key, weights=n, minlength=size)
+        s = np.bincount(key, weights=s, minlength=size)
+        present = n > 0
+        n, s = n[present], s[present]
+        out = {}
+        names = [stats] if isinstance(stats, str) else list(stats)
+        for stat in names:
+            if stat == 'count':
+                out[stat] = n.astype('int64')
+            elif stat == 'sum':
+                out[stat] = s
+            elif stat == 'mean':
+                out[stat] = s / n
+            elif stat in ('std', 'var'):
+                ss_g = np.bincount(key, weights=ss, minlength=size)[present]
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    var = np.maximum(ss_g - s * s / n, 0) / (n - 1)
+                var[n < 2] = np.nan
+                out[stat] = np.sqrt(var) if stat == 'std' else var
+            else:
+                raise ValueError(f'unknown stat {stat!r}, expected one of {STATS}')
+        index = index[present]
+        if isinstance(stats, str):
+            return pd.Series(out[stats], index=index, name=measure)
+        return pd.DataFrame(out, index=index)
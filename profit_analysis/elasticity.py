@@ -0,0 +1,80 @@
+"""Discount elasticity of profit, for every Segment/Country/Product group at once.
+
+The notebook divides ``Profit.pct_change()`` by ``DR.pct_change()`` on the monthly series and
+takes ``idxmax``. That ratio goes to ±inf when the discount ratio barely moves, and it only
+handles one series. Here the changes are computed with grouped (vectorized) operations, the
+denominator is guarded, and a rolling log-log slope is given as a steadier estimator.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .encoding import select
+from .schema import MONEY, PERIOD
+
+MIN_CHANGE = 0.01  # |relative change of DR| under 1% -> no elasticity (instead of a huge ratio)
+WINDOW = 6
+ELASTICITIES = ['Discount_Elasticity', 'LogLog_Elasticity']  # the columns optimal_discount can rank by
+
+
+def _key(by):
+    return [by] if isinstance(by, str) else list(by)
+
+
+def period_sums(df, by=()):
+    """Money sums and DR (%) per group and (Year, Month Number), sorted by period within each group.
+
+    ``df`` is a DataFrame or an EncodedFrame.
+    """
+    by = _key(by)
+    sums = select(df, by + PERIOD + MONEY).groupby(by + PERIOD, observed=True)[MONEY].sum().reset_index()
+    sums['DR'] = (sums['Discounts'] / sums['Gross Sales']) * 100  # Discount Ratio
+    return sums.sort_values(by + PERIOD, ignore_index=True)
+
+
+def elasticities(sums, by=(), min_change=MIN_CHANGE, window=WINDOW):
+    """Add Profit_Change, DR_Change, Discount_Elasticity and LogLog_Elasticity to ``period_sums``.
+
+    Discount_Elasticity is the notebook's %ΔProfit / %ΔDR, NaN where |%ΔDR| < ``min_change``.
+    LogLog_Elasticity is the slope of log(Profit) on log(DR) over the last ``window`` periods of
+    the group (NaN where Profit or DR are not positive, or DR is flat over the window).
+    """
+    by = _key(by)
+    out = sums.copy()
+    keys = [out[c] for c in by] if by else np.zeros(len(out))
+    grouped = out.groupby(keys, observed=True, sort=False)
+    out['Profit_Change'] = grouped['Profit'].pct_change()
+    out['DR_Change'] = grouped['DR'].pct_change()
+    guarded = out['DR_Change'].where(out['DR_Change'].abs() >= min_change)
+    out['Discount_Elasticity'] = (out['Profit_Change'] / guarded).replace([np.inf, -np.inf], np.nan)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        lx = np.log(out['DR'].where(out['DR'] > 0))
+        ly = np.log(out['Profit'].where(out['Profit'] > 0))
+    terms = pd.DataFrame({'n': (lx.notna() & ly.notna()).astype('float64')})
+    valid = terms['n'] > 0
+    terms['x'] = lx.where(valid, 0)
+    terms['y'] = ly.where(valid, 0)
+    terms['xy'] = terms['x'] * terms['y']
+    terms['xx'] = terms['x'] * terms['x']
+    rolled = (terms.groupby(keys, observed=True, sort=False)
+                   .rolling(window, min_periods=1).sum()
+                   .reset_index(level=list(range(len(by) or 1)), drop=True)
+                   .sort_index())
+    n = rolled['n']
+    denom = n * rolled['xx'] - rolled['x'] ** 2
+    slope = (n * rolled['xy'] - rolled['x'] * rolled['y']) / denom
+    out['LogLog_Elasticity'] = slope.where((n >= 3) & (denom > 1e-12 * n * n))
+    return out
+
+
+def optimal_discount(el, by=(), column='Discount_Elasticity'):
+    """Per group, the period where ``column`` is highest while still positive (DR, Profit, elasticity)."""
+    by = _key(by)
+    positive = el[el[column] > 0]
+    if by:
+        best = positive.groupby(by, observed=True)[column].idxmax().dropna()
+    else:
+        best = pd.Series([positive[column].idxmax()] if len(positive) else [], dtype='int64')
+    period = [c for c in PERIOD + ['Month-Year'] if c in el.columns]
+    return el.loc[best.astype('int64').to_numpy(), by + period + ['DR', 'Profit', column]].reset_index(drop=True)
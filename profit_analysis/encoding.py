@@ -0,0 +1,143 @@
+"""Compact categorical encoding instead of a dense ``pd.get_dummies`` expansion.
+
+The categorical columns are kept as integer category codes. A one-hot view is only built on
+demand, as a scipy CSR matrix with one non-zero per row and categorical column, so memory and
+the correlation/model stages scale with the number of non-zeros, not with the cardinality.
+Column names are the ones ``pd.get_dummies`` would produce ('Country_Canada', ...).
+"""
+
+import numpy as np
+import pandas as pd
+
+from .instrument import stage
+
+
+class EncodedFrame:
+    """Numeric columns as a DataFrame plus integer codes for the categorical columns."""
+
+    def __init__(self, numeric, codes, categories):
+        self.numeric = numeric
+        self.codes = codes  # column -> int32 codes (one per row)
+        self.categories = categories  # column -> Index of the categories
+
+    def __len__(self):
+        return len(self.numeric)
+
+    @property
+    def dummy_columns(self):
+        return [f'{c}_{v}' for c, cats in self.categories.items() for v in cats]
+
+    @property
+    def columns(self):
+        return list(self.numeric.columns) + self.dummy_columns
+
+    @property
+    def nnz(self):
+        return self.numeric.size + sum(int((v >= 0).sum()) for v in self.codes.values())
+
+    def column(self, name):
+        """Values of any column, with the labels (not the codes) for a categorical one."""
+        if name in self.codes:
+            codes = self.codes[name]
+            return pd.Series(pd.Categorical.from_codes(codes, self.categories[name]), index=self.numeric.index, name=name)
+        return self.numeric[name]
+
+    def __getitem__(self, key):
+        return self.numeric[key]
+
+    def __setitem__(self, key, value):
+        self.numeric[key] = value
+
+    def drop(self, columns, axis=1):
+        """Drop numeric columns (same call as ``DataFrame.drop(columns, axis=1)``)."""
+        return EncodedFrame(self.numeric.drop(columns, axis=axis), self.codes, self.categories)
+
+    def head(self, n=5):
+        """Small dense preview, with the dummy columns expanded."""
+        return self.take(np.arange(min(n, len(self)))).to_dense()
+
+    def take(self, rows):
+        return EncodedFrame(self.numeric.iloc[rows], {c: v[rows] for c, v in self.codes.items()}, self.categories)
+
+    def onehot(self, dtype='float64'):
+        """CSR one-hot matrix of all the categorical columns (n_rows x total categories)."""
+        from scipy import sparse
+
+        n = len(self)
+        offsets = np.cumsum([0] + [len(c) for c in self.categories.values()])
+        rows, cols = [], []
+        for j, c in enumerate(self.codes):
+            codes = self.codes[c]
+            present = codes >= 0  # missing value: all zeros, like get_dummies
+            rows.append(np.flatnonzero(present))
+            cols.append(codes[present] + offsets[j])
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        data = np.ones(len(rows), dtype=dtype)
+        return sparse.csr_matrix((data, (rows, cols)), shape=(n, offsets[-1]))
+
+    def to_csr(self, dtype='float64', center=False):
+        """Numeric columns followed by the one-hot columns, as one CSR matrix (order of ``columns``).
+
+        ``center`` subtracts the mean of the numeric columns (the one-hot part stays sparse).
+        """
+        from scipy import sparse
+
+        values = self.numeric.to_numpy(dtype=dtype)
+        if center:
+            values = values - values.mean(axis=0)
+        dense = sparse.csr_matrix(values)
+        return sparse.hstack([dense, self.onehot(dtype)], format='csr')
+
+    def to_codes(self, dtype='float64'):
+        """Numeric columns followed by one integer-code column per categorical (fine for trees)."""
+        codes = np.column_stack([v for v in self.codes.values()]) if self.codes else np.empty((len(self), 0))
+        return np.hstack([self.numeric.to_numpy(dtype=dtype), codes.astype(dtype)])
+
+    @property
+    def code_columns(self):
+        return list(self.numeric.columns) + list(self.codes)
+
+    def to_dense(self):
+        """The ``pd.get_dummies`` frame (only for small data)."""
+        dummies = pd.DataFrame(self.onehot('int64').toarray(), columns=self.dummy_columns, index=self.numeric.index)
+        return pd.concat([self.numeric, dummies], axis=1)
+
+    def corr(self):
+        """Pearson correlation of all the columns, like ``get_dummies(...).corr()``.
+
+        Works from the Gram matrix X'X of the sparse matrix, so the cost is O(non-zeros x columns).
+        The numeric columns are centered first, to keep the sums of squares small.
+        """
+        with stage('correlation', rows_in=len(self)):
+            x = self.to_csr(center=True)
+            gram = (x.T @ x).toarray()
+        n = x.shape[0]
+        sums = np.asarray(x.sum(axis=0)).ravel()
+        cov = (gram - np.outer(sums, sums) / n) / (n - 1)
+        std = np.sqrt(np.diag(cov))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = cov / np.outer(std, std)
+        corr[np.outer(std, std) == 0] = np.nan  # constant column, pandas gives NaN too
+        np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+        columns = self.columns
+        return pd.DataFrame(np.clip(corr, -1, 1), index=columns, columns=columns)
+
+
+def encode(df, columns):
+    """Encode ``columns`` of ``df`` as category codes; the other columns stay as they are.
+
+    Drop-in for ``pd.get_dummies(df, columns=columns, dtype=int)``.
+    """
+    codes, categories = {}, {}
+    for c in columns:
+        cat = df[c].astype('category')  # unused categories are kept, get_dummies keeps them too
+        codes[c] = cat.cat.codes.to_numpy().astype(np.int32)
+        categories[c] = cat.cat.categories
+    return EncodedFrame(df.drop(columns, axis=1).copy(), codes, categories)
+
+
+def select(data, columns):
+    """Plain DataFrame with ``columns`` of a DataFrame or an EncodedFrame (labels for the categoricals)."""
+    if isinstance(data, EncodedFrame):
+        return pd.DataFrame({c: data.column(c) for c in columns})
+    return data[columns]
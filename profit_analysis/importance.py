@@ -0,0 +1,160 @@
+"""Parallel feature-importance driver.
+
+Runs one RandomForest per slice (segment, country, time window...) on a process pool and
+reports, for each feature, the impurity importance (``feature_importances_``, what the notebook
+prints), the permutation importance on the held-out rows and the out-of-bag R² of the forest.
+
+The feature matrix, the target and the slice labels are copied once into shared memory; the
+workers attach to it when they start, so a job only sends its slice code and gets back a few
+numbers. Results are cached on disk by data hash and hyperparameters.
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from .ingest import read_cache, write_cache
+from .instrument import stage
+
+FOREST = {'n_estimators': 100, 'random_state': 10}  # the notebook's forest
+CACHE_DIR = os.path.join(os.environ.get('PROFIT_ANALYSIS_CACHE', '.profit_cache'), 'importance')
+MIN_ROWS = 20
+
+_shared = {}  # name -> ndarray attached to shared memory (set in each worker)
+
+
+def _attach(spec):
+    for name, (shm_name, shape, dtype) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _shared[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        _shared['_' + name] = shm  # keep the mapping alive
+
+
+def _share(arrays):
+    handles, spec = [], {}
+    for name, a in arrays.items():
+        a = np.ascontiguousarray(a)
+        shm = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+        np.ndarray(a.shape, dtype=a.dtype, buffer=shm.buf)[...] = a
+        handles.append(shm)
+        spec[name] = (shm.name, a.shape, a.dtype.str)
+    return handles, spec
+
+
+def _fit(code, params, test_size, n_repeats):
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.inspection import permutation_importance
+    from sklearn.model_selection import train_test_split
+
+    start = time.perf_counter()
+    rows = np.flatnonzero(_shared['groups'] == code)
+    X, y = _shared['X'][rows], _shared['y'][rows]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size,
+                                                        random_state=params['random_state'])
+    model = RandomForestRegressor(oob_score=True, n_jobs=1, **params).fit(X_train, y_train)
+    perm = permutation_importance(model, X_test, y_test, n_repeats=n_repeats,
+                                  random_state=params['random_state'], n_jobs=1)
+    return {
+        'rows': len(rows),
+        'oob_r2': float(model.oob_score_),
+        'test_r2': float(model.score(X_test, y_test)),
+        'impurity': model.feature_importances_.tolist(),
+        'permutation_mean': perm.importances_mean.tolist(),
+        'permutation_std': perm.importances_std.tolist(),
+        'wall_time': time.perf_counter() - start,
+    }
+
+
+def data_hash(X, y, groups):
+    h = hashlib.sha256()
+    for a in (X, y, groups):
+        a = np.ascontiguousarray(a)
+        h.update(str((a.shape, a.dtype.str)).encode())
+        h.update(a.data)
+    return h.hexdigest()
+
+
+def _key(digest, label, params, test_size, n_repeats, features):
+    raw = json.dumps([digest, str(label), params, test_size, n_repeats, list(features)], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()[:24]
+
+
+def _to_frames(label, features, result):
+    imp = pd.DataFrame({
+        'Group': label,
+        'Feature': features,
+        'Impurity': result['impurity'],
+        'Permutation': result['permutation_mean'],
+        'Permutation std': result['permutation_std'],
+    })
+    run = pd.DataFrame([{'Group': label, 'Rows': result['rows'], 'OOB R2': result['oob_r2'],
+                         'Test R2': result['test_r2'], 'Wall time (s)': result['wall_time']}])
+    return imp, run
+
+
+def _run(pending, results, X, y, codes, labels, features, params, test_size, n_repeats, max_workers):
+    handles, spec = _share({'X': X, 'y': y, 'groups': codes})
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach, initargs=(spec,)) as pool:
+            futures = {c: pool.submit(_fit, c, params, test_size, n_repeats) for c, _ in pending}
+            for c, paths in pending:
+                results[c] = _to_frames(labels[c], features, futures[c].result())
+                if paths:
+                    for frame, p in zip(results[c], paths):
+                        write_cache(frame, p)
+    finally:
+        for shm in handles:
+            shm.close()
+            shm.unlink()
+
+
+def groups_of(enc, column):
+    """Slice labels of an EncodedFrame column (categorical or numeric, e.g. 'Country' or 'Year')."""
+    return enc.column(column).to_numpy()
+
+
+def feature_importances(X, y, features, groups=None, params=None, test_size=0.2, n_repeats=5,
+                        max_workers=None, cache_dir=CACHE_DIR, min_rows=MIN_ROWS):
+    """Fit one forest per group on a process pool and return ``(importances, runs)``.
+
+    ``X`` is a 2-D numeric array (e.g. ``EncodedFrame.to_codes()``), ``features`` its column names,
+    ``groups`` one label per row (``None`` for a single job on all the rows). ``importances`` has one
+    row per (Group, Feature); ``runs`` has one row per job with its size, OOB/test R² and wall time.
+    Groups with fewer than ``min_rows`` rows are skipped.
+    """
+    params = {**FOREST, **(params or {})}
+    X = np.asarray(X, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    if groups is None:
+        codes, labels = np.zeros(len(y), dtype=np.int32), pd.Index(['All'])
+    else:
+        codes, labels = pd.factorize(pd.Series(groups).to_numpy(), sort=True)
+        codes = codes.astype(np.int32)
+    sizes = np.bincount(codes[codes >= 0], minlength=len(labels))
+    todo = [c for c in range(len(labels)) if sizes[c] >= min_rows]
+
+    digest = data_hash(X, y, codes)
+    results, pending = {}, []
+    for c in todo:
+        key = _key(digest, labels[c], params, test_size, n_repeats, features)
+        paths = [os.path.join(cache_dir, f'{key}.{part}.arrow') for part in ('importances', 'run')] if cache_dir else None
+        if paths and all(os.path.exists(p) for p in paths):
+            results[c] = tuple(read_cache(p) for p in paths)
+        else:
+            pending.append((c, paths))
+
+    if pending:
+        with stage('feature_importance', rows_in=len(y), jobs=str(len(pending))):
+            _run(pending, results, X, y, codes, labels, features, params, test_size, n_repeats, max_workers)
+
+    if not results:
+        raise ValueError(f'no group has at least {min_rows} rows')
+    importances = pd.concat([results[c][0] for c in todo], ignore_index=True)
+    runs = pd.concat([results[c][1] for c in todo], ignore_index=True)
+    return importances, runs
@@ -0,0 +1,220 @@
+"""Ingest layer: parse the workbook once, then reuse a typed columnar cache.
+
+The first load of a workbook goes through ``pd.read_excel`` (openpyxl), cleans the
+columns and writes an uncompressed Arrow IPC file next to it. Later loads memory-map
+that file, so the numeric columns come back without being copied or re-parsed.
+
+A directory or a glob (one export per country per month) is loaded on a process pool: each
+worker parses one file into its cache, and the main process memory-maps the caches and
+concatenates them in one allocation.
+"""
+
+import glob
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from .instrument import stage
+from .schema import CATEGORICALS, DATE, normalise_columns, optimise
+
+CACHE_DIR = os.environ.get('PROFIT_ANALYSIS_CACHE', '.profit_cache')
+CACHE_VERSION = '1'
+READERS = {'.xlsx': pd.read_excel, '.xls': pd.read_excel, '.xlsm': pd.read_excel,
+           '.csv': pd.read_csv, '.parquet': pd.read_parquet}
+
+
+def read_raw(path):
+    """Read a transactions export as-is (xlsx/xls, csv or parquet)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in READERS:
+        raise ValueError(f'unsupported transactions file: {path}')
+    with stage('read_' + ext.lstrip('.')) as s:
+        df = READERS[ext](path)
+        s.rows_out = df
+    return df
+
+
+def expand_paths(source):
+    """The transactions files named by ``source``: a file, a directory or a glob pattern, sorted.
+
+    In a directory every supported file is taken; Excel lock files (``~$...``) are skipped.
+    """
+    if os.path.isfile(source):
+        return [source]
+    if os.path.isdir(source):
+        paths = glob.glob(os.path.join(source, '*'))
+    else:
+        paths = glob.glob(source, recursive=True)
+    paths = sorted(p for p in paths if os.path.isfile(p) and not os.path.basename(p).startswith('~$')
+                   and os.path.splitext(p)[1].lower() in READERS)
+    if not paths:
+        raise FileNotFoundError(f'no transactions files in {source}')
+    return paths
+
+
+def prepare(df, categoricals=True):
+    """Normalise column names and parse dates/categoricals, once, at ingest time."""
+    df = normalise_columns(df)
+    if DATE in df.columns:
+        df[DATE] = pd.to_datetime(df[DATE])
+    if categoricals:
+        for c in CATEGORICALS:
+            if c in df.columns:
+                df[c] = df[c].astype('category')
+    return df
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """sha256 of the file content."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_key(path, variant=''):
+    """Cache key built from the absolute path, the mtime and the content hash (and the dtype variant)."""
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+    raw = f'{CACHE_VERSION}|{path}|{mtime}|{file_digest(path)}|{variant}'
+    return hashlib.sha256(raw.encode()).hexdigest()[:24]
+
+
+def _cache_prefix(path, variant=''):
+    """File name prefix shared by every cache of ``path`` (any mtime/content) in one variant."""
+    return hashlib.sha256(f'{os.path.abspath(path)}|{variant}'.encode()).hexdigest()[:12] + '-'
+
+
+def cache_path(path, cache_dir=None, variant=''):
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR)
+    return os.path.join(cache_dir, _cache_prefix(path, variant) + cache_key(path, variant) + '.arrow')
+
+
+def _prune(target):
+    """Remove the caches of older versions of the file ``target`` caches."""
+    directory, name = os.path.split(target)
+    prefix = name[:name.index('-') + 1]
+    for other in os.listdir(directory or '.'):
+        if other.startswith(prefix) and other.endswith('.arrow') and other != name:
+            try:
+                os.remove(os.path.join(directory, other))
+            except OSError:
+                pass
+
+
+def write_cache(df, target):
+    import pyarrow as pa
+
+    directory = os.path.dirname(target)
+    if directory:  # a bare file name is written to the working directory
+        os.makedirs(directory, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp = f'{target}.{os.getpid()}.tmp'
+    try:
+        with pa.OSFile(tmp, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp, target)  # never leave a half written cache behind
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def read_cache(target):
+    """Memory-map an Arrow cache file; numeric columns are not copied."""
+    import pyarrow as pa
+
+    with stage('read_cache') as s:
+        table = pa.ipc.open_file(pa.memory_map(target, 'r')).read_all()
+        df = table.to_pandas(split_blocks=True)
+        s.rows_out = df
+    return df
+
+
+def _parse(path, compact, money):
+    df = prepare(read_raw(path))
+    return optimise(df, money) if compact else df
+
+
+def _cached(path, cache_dir, compact, money):
+    """Path of the Arrow cache of ``path``, parsing the file into it first if needed.
+
+    When the cache cannot be written (read-only directory, full disk) the parsed frame is
+    returned instead of a path.
+    """
+    target = cache_path(path, cache_dir, f'compact-{money}' if compact else '')
+    if os.path.exists(target):
+        return target
+    df = _parse(path, compact, money)
+    try:
+        write_cache(df, target)
+        _prune(target)
+    except OSError:
+        return df
+    return target
+
+
+def _has_arrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def concat_frames(frames):
+    """Concatenate prepared frames with one ``pd.concat``, keeping the dimensions categorical.
+
+    The categories of every categorical column are unified first; otherwise concat falls back
+    to object strings as soon as two files have different countries or products.
+    """
+    frames = list(frames)
+    for c in frames[0].columns:
+        if all(isinstance(f[c].dtype, pd.CategoricalDtype) for f in frames):
+            categories = frames[0][c].cat.categories
+            for f in frames[1:]:
+                categories = categories.union(f[c].cat.categories)
+            frames = [f.assign(**{c: f[c].cat.set_categories(categories)}) for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _load_many(paths, cache_dir, use_cache, compact, money, max_workers):
+    with stage('ingest_files', files=len(paths)) as s:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            if use_cache and _has_arrow():
+                import pyarrow as pa
+
+                targets = list(pool.map(_cached, paths, [cache_dir] * len(paths), [compact] * len(paths),
+                                        [money] * len(paths)))
+                tables = [pa.ipc.open_file(pa.memory_map(t, 'r')).read_all() if isinstance(t, str)
+                          else pa.Table.from_pandas(t, preserve_index=False) for t in targets]
+                # zero-copy concat of the mapped tables, then one conversion: every column is allocated once
+                df = pa.concat_tables(tables, promote_options='permissive').to_pandas(split_blocks=True)
+            else:
+                df = concat_frames(pool.map(_parse, paths, [compact] * len(paths), [money] * len(paths)))
+        s.rows_out = df
+    return df
+
+
+def load_transactions(path, cache_dir=None, use_cache=True, compact=False, money='float', max_workers=None):
+    """Load a transactions export through the columnar cache.
+
+    Returns the prepared frame: stripped column names ('Sales', 'Date'), parsed dates
+    and categorical dimensions. ``compact=True`` applies the dtypes of ``schema.optimise``
+    (``money='cents'`` for integer cents); the compact frame is cached separately.
+
+    ``path`` can also be a directory or a glob of exports (see ``expand_paths``): the files
+    are parsed on ``max_workers`` processes and returned as one frame, in file name order.
+    """
+    paths = expand_paths(path)
+    if len(paths) > 1:
+        return _load_many(paths, cache_dir, use_cache, compact, money, max_workers)
+    path = paths[0]
+    if not use_cache or not _has_arrow():  # no Arrow available, parse every time
+        return _parse(path, compact, money)
+    cached = _cached(path, cache_dir, compact, money)
+    return read_cache(cached) if isinstance(cached, str) else cached
@@ -0,0 +1,240 @@
+"""Stage-level instrumentation: timers, row counts, memory deltas, optional cProfile/tracemalloc.
+
+Stages are named blocks::
+
+    with stage('dedup', rows_in=len(df)) as s:
+        new_df = ...
+        s.rows_out = len(new_df)
+
+With ``profile`` every stage gets its own cProfile dump, which leaves out the time of the stages
+nested in it (they have their own dumps). With ``trace_memory`` a stage records the tracemalloc
+peak above what was allocated when it started, nested stages included.
+
+Nothing is recorded until ``enable()`` is called (or PROFIT_ANALYSIS_TRACE is set): a disabled
+``stage()`` returns a shared no-op object, so the hooks can stay in the hot paths. Records go to a
+JSON lines log as they complete and/or to an OpenMetrics text file written by ``flush()``.
+"""
+
+import atexit
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+_recorder = None
+
+
+class _Noop:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):  # s.rows_out = ... is fine when disabled
+        pass
+
+
+_NOOP = _Noop()
+
+
+def rss():
+    """Current resident set size in bytes (peak RSS where /proc is not available)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+def _count(obj):
+    if obj is None or isinstance(obj, int):
+        return obj
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+
+class _Stage:
+    def __init__(self, recorder, name, rows_in, labels):
+        self.recorder = recorder
+        self.name = name
+        self.rows_in = _count(rows_in)
+        self.rows_out = None
+        self.labels = labels
+        self._profiler = None
+
+    def __enter__(self):
+        r = self.recorder
+        stack = r.stack()
+        if r.profile:  # one profiler active at a time: the enclosing stage's pauses until this one exits
+            import cProfile
+
+            if stack['profilers']:
+                stack['profilers'][-1].disable()
+            self._profiler = cProfile.Profile()
+            stack['profilers'].append(self._profiler)
+            self._profiler.enable()
+        if r.trace_memory:
+            import tracemalloc
+
+            traced, peak = tracemalloc.get_traced_memory()
+            if stack['peaks']:  # the enclosing stage's peak so far, before the reset below loses it
+                stack['peaks'][-1] = max(stack['peaks'][-1], peak)
+            stack['peaks'].append(0)
+            self._traced = traced
+            tracemalloc.reset_peak()
+        self._rss = rss()
+        self._wall = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        r = self.recorder
+        stack = r.stack()
+        record = {
+            'stage': self.name,
+            'start': self._wall,
+            'seconds': seconds,
+            'rows_in': self.rows_in,
+            'rows_out': _count(self.rows_out),
+            'rss_delta_bytes': rss() - self._rss,
+            'ok': exc_type is None,
+        }
+        if self.labels:
+            record['labels'] = self.labels
+        if r.trace_memory:
+            import tracemalloc
+
+            peak = max(tracemalloc.get_traced_memory()[1], stack['peaks'].pop())
+            if stack['peaks']:
+                stack['peaks'][-1] = max(stack['peaks'][-1], peak)
+            record['traced_peak_bytes'] = peak - self._traced  # above what was allocated at the start
+        if self._profiler is not None:
+            self._profiler.disable()
+            stack['profilers'].pop()
+            with r.lock:
+                r.n_profiles += 1
+                n = r.n_profiles
+            path = os.path.join(r.profile_dir, f'{self.name}-{n}.prof')
+            os.makedirs(r.profile_dir, exist_ok=True)
+            self._profiler.dump_stats(path)
+            record['profile'] = path
+            if stack['profilers']:
+                stack['profilers'][-1].enable()
+        r.add(record)
+        return False
+
+
+class Recorder:
+    def __init__(self, log_path=None, metrics_path=None, profile=False, profile_dir='profiles', trace_memory=False):
+        self.log_path = log_path
+        self.metrics_path = metrics_path
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.last = {}  # stage -> its last record; the log file has all of them
+        self.runs = {}  # stage -> number of runs
+        self.n_profiles = 0
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        if trace_memory:
+            import tracemalloc
+
+            tracemalloc.start()
+
+    def stack(self):
+        """This thread's open stages: their profilers and their tracemalloc peaks so far."""
+        local = self._local
+        if not hasattr(local, 'stack'):
+            local.stack = {'profilers': [], 'peaks': []}
+        return local.stack
+
+    def add(self, record):
+        with self.lock:
+            self.last[record['stage']] = record
+            self.runs[record['stage']] = self.runs.get(record['stage'], 0) + 1
+        if self.log_path:
+            with open(self.log_path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
+    def openmetrics(self):
+        """OpenMetrics text of the last run of every stage, plus run counts."""
+        with self.lock:
+            last, runs = dict(self.last), dict(self.runs)
+        lines = []
+        gauges = [
+            ('seconds', 'seconds', 'Wall time of the last run of the stage'),
+            ('rows_in', 'rows_in', 'Rows into the last run of the stage'),
+            ('rows_out', 'rows_out', 'Rows out of the last run of the stage'),
+            ('rss_delta_bytes', 'rss_delta_bytes', 'RSS change over the last run of the stage'),
+            ('traced_peak_bytes', 'traced_peak_bytes', 'tracemalloc peak of the last run of the stage, above its start'),
+        ]
+        for key, metric, help_text in gauges:
+            samples = [(s, r[key]) for s, r in last.items() if r.get(key) is not None]
+            if not samples:
+                continue
+            name = f'profit_analysis_stage_{metric}'
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'# HELP {name} {help_text}.')
+            lines.extend(f'{name}{{stage="{s}"}} {v}' for s, v in samples)
+        if runs:
+            name = 'profit_analysis_stage_runs'
+            lines.append(f'# TYPE {name} counter')
+            lines.append(f'# HELP {name} Number of runs of the stage.')
+            lines.extend(f'{name}_total{{stage="{s}"}} {n}' for s, n in runs.items())
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def flush(self):
+        if self.metrics_path:
+            tmp = self.metrics_path + '.tmp'
+            with open(tmp, 'w') as f:
+                f.write(self.openmetrics())
+            os.replace(tmp, self.metrics_path)  # the scraper never sees a partial file
+
+
+def enable(log_path=None, metrics_path=None, profile=False, profile_dir='profiles', trace_memory=False):
+    """Start recording stages; the metrics file is written by ``flush()`` and at exit."""
+    global _recorder
+    _recorder = Recorder(log_path, metrics_path, profile, profile_dir, trace_memory)
+    atexit.register(_recorder.flush)
+    return _recorder
+
+
+def disable():
+    global _recorder
+    if _recorder is not None:
+        _recorder.flush()
+        atexit.unregister(_recorder.flush)
+        if _recorder.trace_memory:
+            import tracemalloc
+
+            tracemalloc.stop()
+    _recorder = None
+
+
+def flush():
+    if _recorder is not None:
+        _recorder.flush()
+
+
+def recorder():
+    return _recorder
+
+
+def stage(name, rows_in=None, **labels):
+    """Context manager timing the block as stage ``name`` (no-op unless enabled)."""
+    if _recorder is None:
+        return _NOOP
+    return _Stage(_recorder, name, rows_in, labels)
+
+
+if os.environ.get('PROFIT_ANALYSIS_TRACE'):
+    enable(log_path=os.environ['PROFIT_ANALYSIS_TRACE'], metrics_path=os.environ.get('PROFIT_ANALYSIS_METRICS'))
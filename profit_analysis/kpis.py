@@ -0,0 +1,72 @@
+"""Incremental monthly KPI state.
+
+Keeps the additive sums (Gross Sales, Discounts, Sales, COGS, Profit) per (Year, Month Number),
+optionally split by Segment/Country/Product. Appending transactions only touches the buckets
+they fall in and only those buckets get their GPM/COGSM/DR re-derived, so a refresh costs
+O(new rows) instead of a full recompute of ``monthly``.
+"""
+
+import os
+
+import pandas as pd
+
+from .ingest import read_cache, write_cache
+from .pipeline import RATIOS, ratios
+from .schema import DEDUP_KEY, MONEY, PERIOD
+
+
+class KPIState:
+    """Persisted sums and ratios per (Year, Month Number[, *by]) bucket."""
+
+    def __init__(self, by=(), table=None):
+        self.by = list(by)
+        self.key = PERIOD + self.by
+        if table is None:
+            index = pd.MultiIndex.from_arrays([[]] * len(self.key), names=self.key)
+            table = pd.DataFrame({c: pd.Series(dtype='float64') for c in MONEY + RATIOS}, index=index)
+        self.table = table
+
+    @classmethod
+    def load(cls, path):
+        table = read_cache(path).copy()  # the cache is memory-mapped read-only, the state gets updated in place
+        by = [c for c in table.columns if c not in PERIOD + MONEY + RATIOS]
+        return cls(by, table.set_index(PERIOD + by).sort_index())
+
+    def save(self, path):
+        write_cache(self.table.reset_index(), path)
+
+    @classmethod
+    def open(cls, path, by=()):
+        """Load the state at ``path`` if it exists, otherwise start an empty one."""
+        return cls.load(path) if os.path.exists(path) else cls(by)
+
+    def update(self, transactions):
+        """Add new transactions; returns the index of the buckets that changed."""
+        # same rows as the notebook's monthly: rows with a missing dedup key never make it to new_df
+        rows = transactions[transactions[DEDUP_KEY].notna().all(axis=1)]
+        part = rows.groupby(self.key, observed=True)[MONEY].sum()
+        if part.empty:
+            return part.index
+        # plain (not categorical) index levels, so buckets for new categories can be appended
+        part.index = part.index.set_levels([lvl.astype(object) if lvl.dtype == 'category' else lvl
+                                            for lvl in part.index.levels])
+        old = part.index.intersection(self.table.index)
+        new = part.index.difference(self.table.index)
+        if len(old):
+            self.table.loc[old, MONEY] += part.loc[old, MONEY]
+        if len(new):
+            self.table = pd.concat([self.table, part.loc[new].reindex(columns=MONEY + RATIOS)]).sort_index()
+        touched = part.index
+        self.table.loc[touched, RATIOS] = ratios(self.table.loc[touched, MONEY])
+        return touched
+
+    def monthly(self):
+        """The notebook's ``monthly`` frame (sums, ratios and Month-Year), summed over ``by`` if any."""
+        if self.by:
+            sums = self.table.groupby(level=PERIOD)[MONEY].sum()
+            table = sums.join(ratios(sums))
+        else:
+            table = self.table
+        monthly = table.reset_index()
+        monthly.insert(2, 'Month-Year', monthly['Month Number'].astype(str) + '-' + monthly['Year'].astype(str))
+        return monthly
@@ -0,0 +1,240 @@
+"""Content-addressed result cache for the expensive analysis steps.
+
+``memoize(func, *args, **kwargs)`` returns ``func(*args, **kwargs)``, from disk when the same call
+was made before. The key combines a fingerprint of the arguments (the content of the frames,
+not their identity), the function and the code version::
+
+    correlation_matrix = memoize(new_df.corr)
+    model = memoize(RandomForestRegressor(n_estimators=100, random_state=10).fit, X_train, y_train)
+
+The code version is the package version plus the hash of the module source for the package's
+stages, the code of the function itself (bytecode, constants, the names it calls, nested
+lambdas) for the caller's own functions and lambdas, and the library version for library
+functions: editing a stage invalidates its results. Entries are pickles; the directory is kept
+under ``max_bytes`` by evicting the least recently used entries (a hit refreshes the file's mtime).
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+
+import numpy as np
+import pandas as pd
+
+from .instrument import stage
+
+CACHE_DIR = os.path.join(os.environ.get('PROFIT_ANALYSIS_CACHE', '.profit_cache'), 'results')
+MAX_BYTES = int(float(os.environ.get('PROFIT_ANALYSIS_RESULTS_MB', 512)) * 2 ** 20)
+SUFFIX = '.pkl'
+
+_MISSING = object()
+_sources = {}  # source file -> digest, hashed once per process
+
+
+def _update(h, obj):
+    """Feed the content of ``obj`` to the hash ``h``."""
+    from .encoding import EncodedFrame
+
+    if isinstance(obj, pd.DataFrame):
+        h.update(b'frame')
+        _update(h, obj.index)
+        for name in obj.columns:
+            _update(h, str(name))
+            _update(h, obj[name])
+    elif isinstance(obj, (pd.Series, pd.Index)):
+        h.update(str(obj.dtype).encode())
+        if isinstance(obj.dtype, pd.CategoricalDtype):
+            _update(h, obj.cat.categories if isinstance(obj, pd.Series) else obj.categories)
+            _update(h, np.asarray(obj.cat.codes if isinstance(obj, pd.Series) else obj.codes))
+        elif obj.dtype.kind in 'biufcmM':
+            _update(h, obj.to_numpy())
+        else:  # strings and objects
+            _update(h, pd.util.hash_pandas_object(obj, index=False).to_numpy())
+    elif isinstance(obj, EncodedFrame):
+        h.update(b'encoded')
+        _update(h, obj.numeric)
+        for name, codes in obj.codes.items():
+            _update(h, name)
+            _update(h, codes)
+            _update(h, obj.categories[name])
+    elif isinstance(obj, np.ndarray):
+        a = np.ascontiguousarray(obj)
+        h.update(str((a.shape, a.dtype.str)).encode())
+        h.update(a.data if a.dtype.kind != 'O' else pickle.dumps(a.tolist()))
+    elif hasattr(obj, 'tocsr'):  # scipy.sparse
+        m = obj.tocsr()
+        h.update(str(m.shape).encode())
+        for a in (m.data, m.indices, m.indptr):
+            _update(h, a)
+    elif isinstance(obj, (list, tuple)):
+        h.update(f'{type(obj).__name__}{len(obj)}'.encode())
+        for item in obj:
+            _update(h, item)
+    elif isinstance(obj, dict):
+        h.update(f'dict{len(obj)}'.encode())
+        for k in sorted(obj, key=str):
+            _update(h, str(k))
+            _update(h, obj[k])
+    elif hasattr(obj, 'get_params'):  # an (unfitted) estimator: its class and hyperparameters
+        h.update(f'{type(obj).__module__}.{type(obj).__qualname__}'.encode())
+        _update(h, obj.get_params(deep=False))
+    else:
+        h.update(f'{type(obj).__name__}:{json.dumps(obj, default=repr)}'.encode())
+
+
+def fingerprint(*objects):
+    """Content hash of frames, arrays, encoded frames and plain parameters."""
+    h = hashlib.blake2b(digest_size=16)
+    for obj in objects:
+        _update(h, obj)
+    return h.hexdigest()
+
+
+def _source_digest(path):
+    if path not in _sources:
+        try:
+            with open(path, 'rb') as f:
+                _sources[path] = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+        except OSError:
+            _sources[path] = None
+    return _sources[path]
+
+
+def _code_digest(code, h=None):
+    """Hash of a code object: bytecode, constants, the names it uses and its nested code objects."""
+    h = h or hashlib.blake2b(digest_size=16)
+    h.update(code.co_code)
+    for names in (code.co_names, code.co_varnames, code.co_freevars, code.co_cellvars):
+        h.update(repr(names).encode())
+    for const in code.co_consts:
+        if inspect.iscode(const):  # lambdas, comprehensions and inner functions
+            _code_digest(const, h)
+        else:
+            h.update(repr(const).encode())
+    return h.hexdigest()
+
+
+def code_version(func):
+    """Package version, the qualified name and code of ``func``, and the source file it comes from."""
+    from . import __version__
+
+    func = getattr(func, '__func__', func)  # bound method -> function
+    parts = [__version__, getattr(func, '__module__', None), getattr(func, '__qualname__', repr(func))]
+    code = getattr(func, '__code__', None)
+    if code is not None:
+        parts.append(_code_digest(code))
+    root = (parts[1] or '').split('.')[0]
+    if root == __package__:  # our stages also depend on the helpers of their module
+        parts.append(_source_digest(inspect.getsourcefile(func)))
+    else:  # a library (its version) or the caller's own function (its code, above)
+        parts.append(getattr(sys.modules.get(root), '__version__', None))
+    return json.dumps(parts, default=str)
+
+
+class ResultCache:
+    """Pickled results on disk, keyed by content, bounded to ``max_bytes`` with LRU eviction."""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key + SUFFIX)
+
+    def get(self, key, default=None):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return default
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            self.discard(key)  # unreadable or written by an incompatible version
+            return default
+        try:
+            os.utime(path)  # most recently used
+        except OSError:
+            pass
+        return value
+
+    def put(self, key, value):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        target = self.path(key)
+        tmp = f'{target}.{os.getpid()}.tmp'
+        try:
+            with open(tmp, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, target)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.evict()
+
+    def discard(self, key):
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def entries(self):
+        """``(mtime, size, path)`` of every entry, least recently used first."""
+        out = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return out
+        for name in names:
+            if name.endswith(SUFFIX):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:  # evicted by another process
+                    continue
+                out.append((st.st_mtime_ns, st.st_size, path))
+        return sorted(out)
+
+    def evict(self):
+        """Drop the least recently used entries until the cache fits in ``max_bytes``."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
+
+
+def memoize(func, *args, cache=None, **kwargs):
+    """``func(*args, **kwargs)``, read from the result cache when the inputs and code are unchanged.
+
+    The inputs are ``args``/``kwargs`` plus, for a bound method, the object it is bound to.
+    ``cache=False`` just calls ``func``; when the cache cannot be written the result is returned
+    without being stored.
+    """
+    if cache is False:
+        return func(*args, **kwargs)
+    cache = cache or ResultCache()
+    name = getattr(func, '__qualname__', type(func).__name__)
+    bound = getattr(func, '__self__', None)
+    key = fingerprint(code_version(func), bound if not inspect.ismodule(bound) else None, args, kwargs)
+    with stage('memo_lookup', function=name):
+        value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        with stage('memo_compute', function=name):
+            value = func(*args, **kwargs)
+        try:
+            cache.put(key, value)
+        except OSError:  # read-only or full cache directory: the result is still good
+            pass
+    return value
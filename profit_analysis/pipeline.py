@@ -0,0 +1,54 @@
+"""In-memory versions of the data preparation and KPI steps of the notebook."""
+
+import pandas as pd
+
+from .instrument import stage
+from .schema import DATE, DEDUP_KEY, MONEY, NUMERIC, PERIOD, SALES
+
+RATIOS = ['GPM', 'COGSM', 'DR']
+
+
+def dedup(df):
+    """Sum the rows sharing the same DEDUP_KEY (the notebook's ``new_df``, before the drop).
+
+    Rows with a missing key (e.g. no Discount Band) are dropped by the groupby, as in the notebook.
+    """
+    values = [c for c in NUMERIC if c in df.columns]
+    with stage('dedup', rows_in=df) as s:
+        new_df = df.groupby(DEDUP_KEY, observed=True)[values].sum().reset_index()
+        s.rows_out = new_df
+    return new_df
+
+
+def monthly_sums(new_df):
+    """Gross Sales, Discounts, Sales, COGS and Profit per (Year, Month Number)."""
+    with stage('monthly', rows_in=new_df) as s:
+        monthly = new_df.groupby(PERIOD, observed=True)[MONEY].sum().reset_index()
+        s.rows_out = monthly
+    return monthly
+
+
+def ratios(sums):
+    """The three KPIs (in %) of a frame of money sums, on the same index."""
+    out = pd.DataFrame(index=sums.index)
+    out['GPM'] = (sums['Profit'] / sums['Sales']) * 100  # Gross Profit Margin
+    out['COGSM'] = (sums['COGS'] / sums['Sales']) * 100  # COGS Margin
+    out['DR'] = (sums['Discounts'] / sums['Gross Sales']) * 100  # Discount Ratio
+    return out
+
+
+def add_ratios(monthly):
+    """Add (or refresh) the three KPIs (in %) in a frame of monthly sums."""
+    monthly[RATIOS] = ratios(monthly)
+    return monthly
+
+
+def model_frame(df):
+    """The notebook's ``new_df`` at the modelling stage: dedup'ed, encoded, with 'Profit margin'."""
+    from .encoding import encode
+
+    new_df = dedup(df).drop(['Discount Band', DATE], axis=1)
+    with stage('encode', rows_in=new_df):
+        new_df = encode(new_df, ['Segment', 'Country', 'Product'])
+    new_df['Profit margin'] = (new_df['Profit'] / new_df[SALES]) * 100
+    return new_df
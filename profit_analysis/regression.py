@@ -0,0 +1,89 @@
+"""Batched OLS of Profit on Discounts over every slice.
+
+The notebook fits ``sm.OLS(Profit, const + Discounts)`` once, on all of ``new_df``. Here the
+same simple regression is solved for every slice at once from grouped sufficient statistics
+(n, Σx, Σy, Σxy, Σx², Σy²): one groupby pass, then closed-form β0/β1, standard errors,
+t/p-values and R² for all the slices, without building a statsmodels model per slice.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .encoding import select
+from .instrument import stage
+
+STATS = ['n', 'sx', 'sy', 'sxy', 'sxx', 'syy']
+
+
+def sufficient_stats(data, x='Discounts', y='Profit', by=()):
+    """n, Σx, Σy, Σxy, Σx², Σy² per slice.
+
+    x and y are shifted by their overall means first, which keeps the sums of squares small;
+    the shift is stored in ``attrs`` and undone by ``ols_from_stats``.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    frame = select(data, by + [x, y])
+    xs = frame[x].to_numpy(dtype='float64')
+    ys = frame[y].to_numpy(dtype='float64')
+    mx, my = float(np.nanmean(xs)), float(np.nanmean(ys))
+    xs, ys = xs - mx, ys - my
+    parts = pd.DataFrame({'n': np.ones(len(xs)), 'sx': xs, 'sy': ys, 'sxy': xs * ys, 'sxx': xs * xs, 'syy': ys * ys},
+                         index=frame.index)
+    if by:
+        stats = pd.concat([frame[by], parts], axis=1).groupby(by, observed=True).sum()
+    else:
+        stats = parts.sum().to_frame('All').T
+        stats.index.name = 'Slice'
+    stats.attrs.update({'x': x, 'y': y, 'x_shift': mx, 'y_shift': my})
+    return stats
+
+
+def ols_from_stats(stats, min_rows=3):
+    """β0, β1, their standard errors and p-values, and R² for every row of ``sufficient_stats``.
+
+    Slices with fewer than ``min_rows`` rows or with a constant x get NaN.
+    """
+    from scipy import stats as st
+
+    n, sx, sy = stats['n'].to_numpy(), stats['sx'].to_numpy(), stats['sy'].to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x, mean_y = sx / n, sy / n
+        Sxx = stats['sxx'].to_numpy() - sx * mean_x
+        Syy = stats['syy'].to_numpy() - sy * mean_y
+        Sxy = stats['sxy'].to_numpy() - sx * mean_y
+        ok = (n >= min_rows) & (Sxx > 0)
+        beta1 = np.where(ok, Sxy / Sxx, np.nan)
+        x_bar = mean_x + stats.attrs.get('x_shift', 0.0)
+        beta0 = mean_y + stats.attrs.get('y_shift', 0.0) - beta1 * x_bar
+        dof = n - 2
+        rss = np.maximum(Syy - beta1 * Sxy, 0)
+        sigma2 = rss / dof
+        se1 = np.sqrt(sigma2 / Sxx)
+        se0 = np.sqrt(sigma2 * (1 / n + x_bar ** 2 / Sxx))
+        t1, t0 = beta1 / se1, beta0 / se0
+        r2 = np.where(Syy > 0, Sxy * Sxy / (Sxx * Syy), np.nan)
+    out = pd.DataFrame({
+        'n': n.astype('int64'),
+        'beta0': beta0,
+        'beta1': beta1,
+        'se_beta0': se0,
+        'se_beta1': se1,
+        't_beta1': t1,
+        'p_beta0': 2 * st.t.sf(np.abs(t0), dof),
+        'p_beta1': 2 * st.t.sf(np.abs(t1), dof),
+        'r2': np.where(ok, r2, np.nan),
+    }, index=stats.index)
+    out.loc[~ok, ['beta0', 'se_beta0', 'se_beta1', 't_beta1', 'p_beta0', 'p_beta1']] = np.nan
+    return out
+
+
+def batched_ols(data, x='Discounts', y='Profit', by=('Segment', 'Country', 'Product')):
+    """Tidy table of the ``y ~ const + x`` regression for every slice of ``by``.
+
+    ``data`` is a DataFrame or an EncodedFrame; ``by`` may include period columns
+    ('Year', 'Month Number'). With ``by=()`` this is the notebook's single OLS.
+    """
+    with stage('ols', rows_in=len(data)) as s:
+        table = ols_from_stats(sufficient_stats(data, x, y, by)).reset_index()
+        s.rows_out = table
+    return table
@@ -0,0 +1,184 @@
+"""Headless batch report: every chart of the notebook rendered to PNG with the Agg backend.
+
+The figures are drawn from small aggregated frames (monthly KPIs, cube roll-ups), never from
+the raw transactions. Rendering runs on a process pool, and a figure is skipped when the hash
+of its input aggregate has not changed since the last run (kept in ``manifest.json``).
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from .cube import Cube
+from .elasticity import period_sums
+from .pipeline import add_ratios, dedup
+from .schema import DR_BIN_LABELS, DR_BINS, PERIOD
+
+RENDERER_VERSION = '1'  # bump when a plot function changes, to redraw everything
+MANIFEST = 'manifest.json'
+
+
+def _trend(data, plt):
+    plt.figure(figsize=(8, 6))
+    plt.plot(data['Month-Year'], data['GPM'], label='Gross Profit Margin')
+    plt.plot(data['Month-Year'], data['COGSM'], label='COGS Margin')
+    plt.plot(data['Month-Year'], data['DR'], label='Discount Ratio')
+    plt.xlabel('Month-Year')
+    plt.xticks(rotation=45)
+    plt.ylabel('Financial Ratios(%)')
+    plt.legend()
+    plt.title('Trend analysis-(Gross profit & COGS margins and discount ratio)')
+
+
+def _profit_over_time(data, plt):
+    plt.figure(figsize=(8, 6))
+    plt.plot(data['Month-Year'], data['Discounts'], label='discount')
+    plt.plot(data['Month-Year'], data['Profit'], label='Profit')
+    plt.ylabel('Profit& discount')
+    plt.xlabel('Month-Year')
+    plt.xticks(rotation=45)
+    plt.title('Profit over time')
+    plt.legend()
+
+
+def _profit_over_dr(data, plt):
+    plt.figure(figsize=(8, 6))
+    plt.bar(data['DR'], data['Profit'], width=0.2)
+    plt.xlabel('Discount Ratio(%)')
+    plt.ylabel('Profit')
+    plt.title('Profit over Discount Ratio')
+
+
+def _profit_by_bin(data, plt):
+    plt.figure(figsize=(8, 6))
+    plt.bar(data['bins'].astype(str), data['Profit'], width=0.2)
+    plt.xlabel('Discount Ratio')
+    plt.ylabel('Profit')
+
+
+def _bar(dim, ylabel, title, color):
+    def draw(data, plt):
+        plt.figure(figsize=(8, 6))
+        plt.bar(data[dim].astype(str), data['Profit'], color=color)
+        plt.xlabel(dim)
+        plt.ylabel(ylabel)
+        plt.title(title)
+    return draw
+
+
+# figure name -> (aggregate it is drawn from, plot function)
+FIGURES = {
+    'trend': ('monthly', _trend),
+    'profit_over_time': ('monthly', _profit_over_time),
+    'profit_over_dr': ('monthly', _profit_over_dr),
+    'profit_by_bin': ('bins', _profit_by_bin),
+    'profit_by_segment': ('segment', _bar('Segment', 'Profit', 'Total Profit by Segment', '#468eb8')),
+    'profit_by_country': ('country', _bar('Country', 'Total Profit', 'Total Profit by Country', '#e37029')),
+    'avg_profit_by_country': ('country_mean', _bar('Country', 'Average Profit', 'Average Profit by Country', '#f59458')),
+    'std_profit_by_country': ('country_std', _bar('Country', 'Variance in Profit', 'Variance in Profit by Country', '#eba275')),
+    'profit_by_product': ('product', _bar('Product', 'Total Profit', 'Total Profit by Product', '#6cc4a1')),
+}
+
+
+def _monthly(sums):
+    monthly = sums.copy()
+    monthly['Month-Year'] = monthly['Month Number'].astype(str) + '-' + monthly['Year'].astype(str)
+    return add_ratios(monthly).reset_index(drop=True)
+
+
+def _bins(monthly):
+    bins = pd.DataFrame({'Discount Ratio': monthly['DR'], 'Profit': monthly['Profit'], 'Discount': monthly['Discounts']})
+    bins['bins'] = pd.cut(x=bins['Discount Ratio'], bins=DR_BINS, labels=DR_BIN_LABELS)
+    return bins
+
+
+def aggregates(df, by=None):
+    """The small frames every figure is drawn from, per business unit of ``by`` (or 'All').
+
+    Returns ``{unit: {aggregate name: DataFrame}}``. KPIs come from the dedup'ed transactions,
+    like the notebook's ``monthly``; the EDA bars are roll-ups of one cube over ``df``.
+    """
+    new_df = dedup(df)
+    keys = [by] if by else []
+    sums = period_sums(new_df, keys)
+    cube = Cube.from_frame(df)
+    units = list(sums[by].unique()) if by else ['All']
+    out = {}
+    for unit in units:
+        where = {by: unit} if by else None
+        monthly = _monthly(sums[sums[by] == unit] if by else sums)
+        out[unit] = {
+            'monthly': monthly.drop(columns=keys + PERIOD),
+            'bins': _bins(monthly),
+            'segment': cube.rollup('Segment', 'Profit', 'sum', where).reset_index(),
+            'country': cube.rollup('Country', 'Profit', 'sum', where).reset_index(),
+            'country_mean': cube.rollup('Country', 'Profit', 'mean', where).reset_index(),
+            'country_std': cube.rollup('Country', 'Profit', 'std', where).reset_index(),
+            'product': cube.rollup('Product', 'Profit', 'sum', where).reset_index(),
+        }
+    return out
+
+
+def aggregate_hash(frame, figure):
+    h = hashlib.sha256(f'{RENDERER_VERSION}|{figure}|{list(frame.columns)}'.encode())
+    h.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _render(figure, data, path):
+    import matplotlib
+
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    FIGURES[figure][1](data, plt)
+    plt.savefig(path, bbox_inches='tight')
+    plt.close('all')
+    return path
+
+
+def _slug(unit):
+    return ''.join(ch if ch.isalnum() or ch in '-_' else '_' for ch in str(unit))
+
+
+def render_reports(df, out_dir, by=None, figures=None, max_workers=None):
+    """Render the figures of every business unit into ``out_dir/<unit>/<figure>.png``.
+
+    Figures whose input aggregate is unchanged since the last run are skipped. Returns a frame with
+    one row per (unit, figure) and whether it was rendered or skipped.
+    """
+    figures = list(FIGURES) if figures is None else list(figures)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    jobs, rows = [], []
+    for unit, frames in aggregates(df, by).items():
+        unit_dir = os.path.join(out_dir, _slug(unit))
+        os.makedirs(unit_dir, exist_ok=True)
+        for figure in figures:
+            data = frames[FIGURES[figure][0]]
+            path = os.path.join(unit_dir, figure + '.png')
+            key = os.path.relpath(path, out_dir)
+            digest = aggregate_hash(data, figure)
+            fresh = manifest.get(key) != digest or not os.path.exists(path)
+            rows.append({'Unit': unit, 'Figure': figure, 'Path': path, 'Rendered': fresh})
+            if fresh:
+                jobs.append((figure, data, path, key, digest))
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [(key, digest, pool.submit(_render, figure, data, path)) for figure, data, path, key, digest in jobs]
+            for key, digest, future in futures:
+                future.result()
+                manifest[key] = digest
+        tmp = manifest_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, manifest_path)
+    return pd.DataFrame(rows)
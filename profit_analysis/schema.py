@@ -0,0 +1,107 @@
+"""Column names and storage dtypes shared by every stage of the profit analysis."""
+
+import numpy as np
+import pandas as pd
+
+# The raw workbook names the sales column ' Sales' (leading space!!) and, in
+# some exports, the date column is headed with a date string instead of 'Date'.
+SALES = 'Sales'
+DATE = 'Date'
+
+DIMENSIONS = ['Segment', 'Country', 'Product', 'Discount Band']
+CATEGORICALS = DIMENSIONS
+
+# Same rows are aggregated when they share these values (see the Duplicates section).
+DEDUP_KEY = ['Segment', 'Country', 'Discount Band', 'Product', DATE, 'Month Number', 'Year']
+
+MONEY = ['Gross Sales', 'Discounts', SALES, 'COGS', 'Profit']
+NUMERIC = ['Units Sold', 'Manufacturing Price', 'Sale Price'] + MONEY
+
+PERIOD = ['Year', 'Month Number']
+
+# Discount Ratio (%) bins of the notebook's binning method: (0, 2], (2, 4], ..., (12, 20]
+DR_BINS = [0, 2, 4, 6, 8, 10, 12, 20]
+DR_BIN_LABELS = ['0-2%', '2-4%', '4-6%', '6-8%', '8-10%', '10-12%', '12%+']
+
+# Compact in-memory representation (``optimise``): the string dimensions become categories, the
+# calendar fields small ints, the prices the smallest int that holds them. Money stays float64,
+# or becomes cents with money='cents' (then Sales - Profit == COGS is an exact integer check):
+# int32 when every amount is below ~21M, int64 otherwise.
+COMPACT_DTYPES = {
+    'Segment': 'category',
+    'Country': 'category',
+    'Product': 'category',
+    'Discount Band': 'category',
+    'Month Name': 'category',
+    'Month Number': 'int8',
+    'Year': 'int16',
+}
+SMALL_INTS = ['Manufacturing Price', 'Sale Price']
+
+
+def _is_date(text):
+    try:
+        pd.Timestamp(text)
+    except ValueError:
+        return False
+    return True
+
+
+def normalise_columns(df):
+    """Strip the stray spaces from column names and rename the date column to 'Date'."""
+    df = df.rename(columns=lambda c: c.strip() if isinstance(c, str) else c)
+    if DATE not in df.columns:
+        dates = [c for c in df.columns if str(df[c].dtype).startswith('datetime64')]
+        if not dates:  # csv exports: the dates are still text, but the header is a date too
+            dates = [c for c in df.columns if isinstance(c, str) and _is_date(c)]
+        if len(dates) == 1:
+            df = df.rename(columns={dates[0]: DATE})
+    return df
+
+
+def is_cents(df):
+    """True when the money columns hold integer cents (see ``optimise``)."""
+    return SALES in df.columns and df[SALES].dtype.kind in 'iu'
+
+
+def to_cents(values):
+    values = np.asarray(values, dtype='float64')
+    if np.isnan(values).any():
+        raise ValueError('missing money values cannot be stored as cents')
+    return np.round(values * 100).astype('int64')
+
+
+def _narrow_cents(cents):
+    """int32 cents when they all fit (sums of them are int64 in pandas), int64 otherwise."""
+    info = np.iinfo(np.int32)
+    if len(cents) and info.min <= cents.min() and cents.max() <= info.max:
+        return cents.astype('int32')
+    return cents
+
+
+def optimise(df, money='float'):
+    """Return ``df`` with the compact dtypes of COMPACT_DTYPES; ``money='cents'`` stores money as integer cents."""
+    if money not in ('float', 'cents'):
+        raise ValueError(f"money must be 'float' or 'cents', not {money!r}")
+    df = df.copy()
+    for c, dtype in COMPACT_DTYPES.items():
+        if c in df.columns:
+            df[c] = df[c].astype(dtype)
+    for c in SMALL_INTS:
+        if c in df.columns and df[c].dtype.kind in 'iuf' and (df[c] % 1 == 0).all():
+            df[c] = pd.to_numeric(df[c].astype('int64'), downcast='integer')
+    for c in MONEY:
+        if c in df.columns:
+            df[c] = _narrow_cents(to_cents(df[c])) if money == 'cents' else df[c].astype('float64')
+    return df
+
+
+def from_cents(df):
+    """Money columns back to float64 currency units."""
+    if not is_cents(df):
+        return df
+    df = df.copy()
+    for c in MONEY:
+        if c in df.columns:
+            df[c] = df[c] / 100
+    return df
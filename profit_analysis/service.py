@@ -0,0 +1,319 @@
+"""Asyncio HTTP service answering KPI, slice and elasticity queries from prepared aggregates.
+
+    profit-analysis serve exports/ --port 8050
+
+    GET /kpis?by=Country                         monthly sums + GPM/COGSM/DR (per Country)
+    GET /slice?by=Product&stat=sum,mean&Year=2014  cube roll-up of a measure, filtered by dims
+    GET /elasticity?by=Segment&optimal=1         discount elasticities (best period per group)
+    GET /health                                  generation, rows and load time of the data
+    POST /reload                                 reload the data now
+
+The transactions are loaded once into a snapshot (``new_df``, the cube, per-``by`` period sums).
+Queries run on a thread pool and their JSON responses are kept per snapshot, so a repeated query
+is a dict lookup; identical queries arriving while the first one is still computing wait for
+the same result instead of computing it again. A watcher polls the files and swaps in a new
+snapshot when they change; queries in flight finish on the snapshot they started with.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlsplit
+
+from .cube import CUBE_DIMS, Cube
+from .elasticity import ELASTICITIES, elasticities, optimal_discount, period_sums
+from .ingest import expand_paths, load_transactions
+from .instrument import stage
+from .pipeline import add_ratios, dedup
+
+RESPONSES = 1024  # JSON responses kept per snapshot
+RELOAD_INTERVAL = 5.0
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class QueryError(ValueError):
+    """Bad query parameters, answered with a 400."""
+
+
+def signature(source):
+    """(path, mtime, size) of every file of ``source``: changes when a file is added, removed or rewritten."""
+    out = []
+    for path in expand_paths(source):
+        st = os.stat(path)
+        out.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(out)
+
+
+class Snapshot:
+    """The aggregates of one load of the data; never modified after it is built (except its memo)."""
+
+    def __init__(self, df, generation=0, signature=()):
+        self.new_df = dedup(df)
+        self.cube = Cube.from_frame(df)
+        self.rows = len(df)
+        self.generation = generation
+        self.signature = signature
+        self.loaded_at = time.time()
+        self.responses = OrderedDict()
+        self._sums = {}
+
+    def period_sums(self, by):
+        by = tuple(by)
+        if by not in self._sums:  # racing threads compute the same frame, either one is kept
+            self._sums[by] = period_sums(self.new_df, list(by))
+        return self._sums[by]
+
+
+def _list(params, name, default=()):
+    value = params.get(name)
+    return [v for v in value.split(',') if v] if value else list(default)
+
+
+def _dims(names):
+    unknown = [d for d in names if d not in CUBE_DIMS]
+    if unknown:
+        raise QueryError(f'unknown dims {unknown}, expected some of {CUBE_DIMS}')
+    return names
+
+
+def _where(params):
+    where = {}
+    for dim in CUBE_DIMS:
+        if dim in params:
+            values = _list(params, dim)
+            if dim in ('Year', 'Month Number'):
+                try:
+                    values = [int(v) for v in values]
+                except ValueError:
+                    raise QueryError(f'{dim} must be an integer') from None
+            where[dim] = values
+    return where
+
+
+def _number(params, name, default, kind=float):
+    try:
+        return kind(params[name]) if name in params else default
+    except ValueError:
+        raise QueryError(f'{name} must be a number') from None
+
+
+def kpis(snap, params):
+    by = _dims(_list(params, 'by'))
+    return add_ratios(snap.period_sums(by).copy())
+
+
+def slice_(snap, params):
+    by = _dims(_list(params, 'by'))
+    stats = _list(params, 'stat', ['sum'])
+    measure = params.get('measure', 'Profit')
+    if measure not in snap.cube.sums:
+        raise QueryError(f'unknown measure {measure!r}, expected one of {list(snap.cube.sums)}')
+    result = snap.cube.rollup(by, measure, stats if len(stats) > 1 else stats[0], where=_where(params))
+    return result.reset_index()
+
+
+def elasticity(snap, params):
+    by = _dims(_list(params, 'by'))
+    column = params.get('column', 'Discount_Elasticity')
+    if column not in ELASTICITIES:
+        raise QueryError(f'unknown column {column!r}, expected one of {ELASTICITIES}')
+    el = elasticities(snap.period_sums(by), by, min_change=_number(params, 'min_change', 0.01),
+                      window=_number(params, 'window', 6, int))
+    if params.get('optimal', '0') not in ('', '0', 'false'):
+        return optimal_discount(el, by, column)
+    return el
+
+
+QUERIES = {'/kpis': kpis, '/slice': slice_, '/elasticity': elasticity}
+
+
+def _json(frame):
+    return frame.to_json(orient='records', date_format='iso').encode()
+
+
+class QueryService:
+    """Holds the current snapshot and answers queries; ``start()`` serves them over HTTP."""
+
+    def __init__(self, source, reload_interval=RELOAD_INTERVAL, load=None, **load_kwargs):
+        self.source = source
+        self.reload_interval = reload_interval
+        self.load = load or (lambda: load_transactions(source, **load_kwargs))
+        self.snapshot = None
+        self.reloads = 0
+        self._inflight = {}
+        self._reload_lock = None
+        self._watcher = None
+        self.server = None
+
+    async def reload(self, force=False):
+        """Load the data again if the files changed (or ``force``); True if a new snapshot was swapped in."""
+        loop = asyncio.get_running_loop()
+        self._reload_lock = self._reload_lock or asyncio.Lock()
+        async with self._reload_lock:
+            sig = await loop.run_in_executor(None, signature, self.source)
+            if not force and self.snapshot is not None and sig == self.snapshot.signature:
+                return False
+            generation = self.snapshot.generation + 1 if self.snapshot else 0
+
+            def build():
+                with stage('service_load', generation=generation):
+                    return Snapshot(self.load(), generation, sig)
+
+            self.snapshot = await loop.run_in_executor(None, build)  # atomic swap
+            self.reloads += 1
+            return True
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await self.reload()
+            except Exception:  # keep serving the old snapshot, try again at the next tick
+                pass
+
+    def _compute(self, snap, path, params):
+        with stage('query', endpoint=path):
+            return _json(QUERIES[path](snap, params))
+
+    async def query(self, path, params=None):
+        """JSON bytes of the answer to ``path`` (e.g. '/kpis') with ``params``; QueryError on bad parameters."""
+        if path not in QUERIES:
+            raise QueryError(f'no such endpoint {path}')
+        params = dict(params or {})
+        snap = self.snapshot
+        key = (snap.generation, path, tuple(sorted(params.items())))
+        body = snap.responses.get(key)
+        if body is not None:
+            snap.responses.move_to_end(key)
+            return body
+        future = self._inflight.get(key)
+        if future is None:  # first one: compute, the duplicates arriving meanwhile await the same future
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(None, self._compute, snap, path, params)
+            self._inflight[key] = future
+            try:
+                body = await future
+            finally:
+                del self._inflight[key]
+            snap.responses[key] = body
+            if len(snap.responses) > RESPONSES:
+                snap.responses.popitem(last=False)
+            return body
+        return await asyncio.shield(future)
+
+    def health(self):
+        snap = self.snapshot
+        return json.dumps({'generation': snap.generation, 'rows': snap.rows, 'files': len(snap.signature),
+                           'loaded_at': snap.loaded_at, 'reloads': self.reloads}).encode()
+
+    async def respond(self, method, target):
+        """``(status, body)`` of one request."""
+        url = urlsplit(target)
+        params = dict(parse_qsl(url.query, keep_blank_values=True))
+        try:
+            if url.path == '/health':
+                return 200, self.health()
+            if url.path == '/reload':
+                if method != 'POST':
+                    return 405, b'{"error": "use POST"}'
+                swapped = await self.reload(force='force' in params)
+                return 200, json.dumps({'reloaded': swapped, 'generation': self.snapshot.generation}).encode()
+            if url.path not in QUERIES:
+                return 404, json.dumps({'error': f'no such endpoint {url.path}', 'endpoints': list(QUERIES)}).encode()
+            if method not in ('GET', 'HEAD'):
+                return 405, b'{"error": "use GET"}'
+            return 200, await self.query(url.path, params)
+        except ValueError as e:  # QueryError, unknown stat...
+            return 400, json.dumps({'error': str(e)}).encode()
+        except Exception as e:  # noqa: BLE001 - the server keeps running, the client gets the error
+            return 500, json.dumps({'error': f'{type(e).__name__}: {e}'}).encode()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode('latin-1').split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = h.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0) or 0)
+                if length:
+                    await reader.readexactly(length)  # nothing reads a body, but it must be consumed
+                status, body = await self.respond(method, target)
+                close = headers.get('connection', '').lower() == 'close' or version == 'HTTP/1.0'
+                writer.write(
+                    f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+                    f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n'
+                    f'Connection: {"close" if close else "keep-alive"}\r\n\r\n'.encode()
+                    + (body if method != 'HEAD' else b''))
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8050):
+        """Load the data, start the watcher and listen; returns the asyncio server."""
+        if self.snapshot is None:
+            await self.reload(force=True)
+        if self.reload_interval and self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch())
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server
+
+    async def stop(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+
+async def get(host, port, target, method='GET'):
+    """Minimal local client: ``(status, decoded JSON)`` of one request."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f'{method} {target} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n'.encode())
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        length = 0
+        while True:
+            h = await reader.readline()
+            if h in (b'\r\n', b''):
+                break
+            if h.lower().startswith(b'content-length:'):
+                length = int(h.split(b':')[1])
+        body = await reader.readexactly(length)
+    finally:
+        writer.close()
+    return status, json.loads(body)
+
+
+def serve(source, host='127.0.0.1', port=8050, reload_interval=RELOAD_INTERVAL, **load_kwargs):
+    """Run the service until interrupted."""
+    async def main():
+        service = QueryService(source, reload_interval, **load_kwargs)
+        server = await service.start(host, port)
+        print(f'serving {source} on http://{host}:{port} ({service.snapshot.rows} rows)', flush=True)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
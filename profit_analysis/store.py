@@ -0,0 +1,245 @@
+"""On-disk transactions store partitioned by Year and Month Number, with predicate pushdown.
+
+    store = Store.write(load_transactions('Financial Sample.xlsx'), 'store/')
+    canada = store.read(['Country', 'Sales', 'Profit', 'Year', 'Month Number'], where={'Country': 'Canada'}, last=3)
+
+Layout: one directory per month (``Year=2014/Month Number=12/``) holding uncompressed Arrow IPC
+files, one record batch per Country, and ``_manifest.json`` with the statistics of every file
+(rows, min/max of the numeric and date columns, the values of the categorical columns) and of
+every batch (its categorical values). A read plans against the manifest first: files outside
+the period or whose statistics exclude the ``where`` values are never opened, and in the files
+that are, only the matching batches and the requested columns are read (memory-mapped, so the
+other columns' pages are never touched). ``plan()`` shows what a query would read.
+"""
+
+import json
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from .instrument import stage
+from .schema import CATEGORICALS, DATE, PERIOD
+
+MANIFEST = '_manifest.json'
+STORE_VERSION = 1
+BATCH_BY = 'Country'
+
+
+def is_store(path):
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def _period(year, month):
+    return int(year) * 12 + int(month) - 1
+
+
+def _parse_period(value):
+    """'2014-06', (2014, 6) or 201406 -> month number since year 0."""
+    if isinstance(value, str):
+        year, _, month = value.partition('-')
+        return _period(year, month or 1)
+    if isinstance(value, (tuple, list)):
+        return _period(*value)
+    return _period(int(value) // 100, int(value) % 100)
+
+
+def _json_value(v):
+    if isinstance(v, pd.Timestamp):
+        return v.isoformat()
+    if isinstance(v, np.generic):
+        return v.item()
+    return v
+
+
+def _stats(frame):
+    stats = {}
+    for c in frame.columns:
+        s = frame[c]
+        if c in CATEGORICALS or not (pd.api.types.is_numeric_dtype(s) or pd.api.types.is_datetime64_any_dtype(s)):
+            stats[c] = {'values': sorted(str(v) for v in s.dropna().unique())}
+        elif s.notna().any():
+            stats[c] = {'min': _json_value(s.min()), 'max': _json_value(s.max())}
+    return stats
+
+
+def _check_last(last):
+    if last is not None and last < 1:
+        raise ValueError(f'last must be at least 1 month, got {last}')
+
+
+def _wanted(where):
+    """``where`` values as lists."""
+    return {c: [v] if np.ndim(v) == 0 else list(v) for c, v in (where or {}).items()}
+
+
+def _may_match(stats, wanted):
+    """False when the statistics prove that no row matches ``wanted``."""
+    for c, values in wanted.items():
+        st = stats.get(c)
+        if st is None:
+            continue
+        if 'values' in st:
+            if not set(map(str, values)) & set(st['values']):
+                return False
+        else:
+            lo, hi = st['min'], st['max']
+            if c == DATE:
+                values, lo, hi = [pd.Timestamp(v) for v in values], pd.Timestamp(lo), pd.Timestamp(hi)
+            if not any(lo <= v <= hi for v in values):
+                return False
+    return True
+
+
+class Store:
+    """A directory of month partitions and its manifest."""
+
+    def __init__(self, root):
+        self.root = root
+        with open(os.path.join(root, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.files = self.manifest['files']
+
+    @classmethod
+    def create(cls, root):
+        os.makedirs(root, exist_ok=True)
+        if not is_store(root):
+            _save(root, {'version': STORE_VERSION, 'batch_by': BATCH_BY, 'columns': [], 'files': []})
+        return cls(root)
+
+    @classmethod
+    def write(cls, df, root, batch_by=BATCH_BY):
+        """Write ``df`` (prepared transactions) as a new store at ``root``, replacing what was there."""
+        if is_store(root):
+            old = cls(root)
+            for entry in old.files:
+                os.remove(os.path.join(root, entry['path']))
+            os.remove(os.path.join(root, MANIFEST))
+        store = cls.create(root)
+        store.manifest['batch_by'] = batch_by
+        store.append(df)
+        return store
+
+    def append(self, df):
+        """Add transactions (e.g. a new month) as new files in their month partitions."""
+        import pyarrow as pa
+
+        batch_by = self.manifest['batch_by']
+        entries = []
+        with stage('store_write', rows_in=df) as s:
+            for (year, month), part in df.groupby(PERIOD, observed=True, sort=True):
+                directory = f'Year={int(year)}/Month Number={int(month)}'
+                os.makedirs(os.path.join(self.root, directory), exist_ok=True)
+                path = f'{directory}/part-{uuid.uuid4().hex[:12]}.arrow'
+                part = part.sort_values([c for c in [batch_by, 'Segment'] if c in part.columns], kind='stable')
+                if batch_by in part:
+                    groups = part.groupby(batch_by, observed=True, sort=False, dropna=False)
+                else:
+                    groups = [(None, part)]
+                table = pa.Table.from_pandas(part, preserve_index=False)
+                batches = [{'rows': len(g), 'stats': {c: st for c, st in _stats(g).items() if 'values' in st}}
+                           for _, g in groups]
+                target = os.path.join(self.root, path)
+                tmp = f'{target}.tmp'
+                with pa.OSFile(tmp, 'wb') as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        offset = 0
+                        for b in batches:
+                            writer.write_batch(table.slice(offset, b['rows']).combine_chunks().to_batches()[0])
+                            offset += b['rows']
+                os.replace(tmp, target)
+                entries.append({'path': path, 'Year': int(year), 'Month Number': int(month), 'rows': len(part),
+                                'bytes': os.path.getsize(target), 'stats': _stats(part), 'batches': batches})
+            s.rows_out = len(entries)
+        self.files = self.files + entries
+        self.manifest['files'] = self.files
+        if not self.manifest['columns']:
+            self.manifest['columns'] = [str(c) for c in df.columns]
+        _save(self.root, self.manifest)
+        return entries
+
+    def periods(self):
+        """Sorted (Year, Month Number) of the partitions."""
+        return sorted({(f['Year'], f['Month Number']) for f in self.files})
+
+    def plan(self, where=None, since=None, until=None, last=None):
+        """``[(file entry, [batch indices])]`` that a read with these predicates has to open.
+
+        ``since``/``until`` are periods ('2014-06', (2014, 6) or 201406), inclusive; ``last`` keeps
+        the last ``last`` months of the store (ValueError below 1).
+        """
+        _check_last(last)
+        wanted = _wanted(where)
+        lo = _parse_period(since) if since is not None else None
+        hi = _parse_period(until) if until is not None else None
+        if last is not None:
+            periods = [_period(y, m) for y, m in self.periods()]
+            lo = max(lo or 0, periods[-last]) if last <= len(periods) else lo
+        out = []
+        for f in self.files:
+            p = _period(f['Year'], f['Month Number'])
+            if (lo is not None and p < lo) or (hi is not None and p > hi) or not _may_match(f['stats'], wanted):
+                continue
+            batches = [i for i, b in enumerate(f['batches']) if _may_match(b['stats'], wanted)]
+            if batches:
+                out.append((f, batches))
+        return out
+
+    def read(self, columns=None, where=None, since=None, until=None, last=None):
+        """Transactions matching ``where`` ({column: value or values}) in the period, as a DataFrame.
+
+        Only the planned files and batches are read, and only ``columns`` (all by default) plus the
+        ones ``where`` needs to filter the rows of the batches that still mix values.
+        """
+        import pyarrow as pa
+
+        plan = self.plan(where, since, until, last)
+        wanted = _wanted(where)
+        columns = list(columns) if columns is not None else self.manifest.get('columns', [])
+        needed = columns + [c for c in wanted if c not in columns]
+        rows = sum(f['batches'][i]['rows'] for f, batches in plan for i in batches)
+        with stage('store_read', rows_in=rows, files=len(plan), of=len(self.files)) as s:
+            tables = []
+            for f, batches in plan:
+                reader = pa.ipc.open_file(pa.memory_map(os.path.join(self.root, f['path']), 'r'))
+                names = [c for c in needed if c in reader.schema.names]
+                tables.append(pa.Table.from_batches([reader.get_batch(i).select(names) for i in batches]))
+            if tables:
+                df = pa.concat_tables(tables, promote_options='permissive').to_pandas(split_blocks=True)
+            else:
+                df = pd.DataFrame({c: [] for c in needed})
+            mask = np.ones(len(df), dtype=bool)
+            for c, values in wanted.items():
+                if c in df.columns:
+                    mask &= df[c].isin(values).to_numpy()
+            if not mask.all():
+                df = df[mask].reset_index(drop=True)
+            df = df[[c for c in columns if c in df.columns]]
+            s.rows_out = df
+        return df
+
+
+def filter_rows(df, where=None, since=None, until=None, last=None):
+    """The same selection as ``Store.read`` on a frame already in memory (no pushdown)."""
+    _check_last(last)
+    mask = np.ones(len(df), dtype=bool)
+    for c, values in _wanted(where).items():
+        mask &= df[c].isin(values).to_numpy()
+    if since is not None or until is not None or last is not None:
+        period = df['Year'].to_numpy(dtype='int64') * 12 + df['Month Number'].to_numpy(dtype='int64') - 1
+        if since is not None:
+            mask &= period >= _parse_period(since)
+        if until is not None:
+            mask &= period <= _parse_period(until)
+        if last is not None:
+            periods = np.unique(period)
+            mask &= period >= periods[-min(last, len(periods))]
+    return df[mask].reset_index(drop=True) if not mask.all() else df
+
+
+def _save(root, manifest):
+    tmp = os.path.join(root, MANIFEST + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, os.path.join(root, MANIFEST))
@@ -0,0 +1,187 @@
+"""Streaming mode for transaction files larger than memory.
+
+Transactions are read chunk by chunk and only the per-group partial sums are kept,
+so peak memory depends on the number of DEDUP_KEY groups, not on the number of rows.
+The results are the same frames as ``pipeline.dedup`` / ``pipeline.monthly_sums``. Legacy
+``.xls`` workbooks cannot be streamed and are read whole, one file at a time.
+
+For a directory or glob of exports, every file is reduced to its partial sums in a worker
+process and the main process only merges those (small) partials.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from .ingest import READERS, expand_paths, prepare, read_raw
+from .pipeline import monthly_sums
+from .instrument import stage
+from .schema import CATEGORICALS, DATE, DEDUP_KEY, NUMERIC, PERIOD
+
+CHUNK_SIZE = 500_000
+
+# read_excel/read_csv turn these cells into NaN (Discount Band literally says 'None'), openpyxl does not
+NA_STRINGS = ['', 'None', 'NA', 'N/A', 'NaN', 'nan', 'NULL', 'null', '#N/A']
+
+
+def _frame(block, header):
+    df = pd.DataFrame(block, columns=header)
+    text = df.select_dtypes(include=['object', 'string']).columns
+    df[text] = df[text].replace(NA_STRINGS, None)
+    for c in text:
+        if c.strip() in NUMERIC + PERIOD:  # e.g. Year is stored as text in the sample workbook
+            df[c] = pd.to_numeric(df[c])
+    return df
+
+
+def _iter_excel(path, chunksize):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = [str(c) for c in next(rows)]
+        block = []
+        for row in rows:
+            block.append(row)
+            if len(block) == chunksize:
+                yield _frame(block, header)
+                block = []
+        if block:
+            yield _frame(block, header)
+    finally:
+        wb.close()
+
+
+def _iter_arrow(batches):
+    for batch in batches:
+        yield batch.to_pandas()
+
+
+def iter_chunks(path, chunksize=CHUNK_SIZE):
+    """Yield prepared chunks (clean column names, parsed dates) of a transactions file."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        chunks = pd.read_csv(path, chunksize=chunksize)
+    elif ext == '.parquet':
+        import pyarrow.parquet as pq
+
+        chunks = _iter_arrow(pq.ParquetFile(path).iter_batches(batch_size=chunksize))
+    elif ext == '.arrow':
+        import pyarrow as pa
+
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()  # memory-mapped, nothing is read yet
+        chunks = _iter_arrow(table.to_batches(max_chunksize=chunksize))
+    elif ext in ('.xlsx', '.xlsm'):
+        chunks = _iter_excel(path, chunksize)
+    elif ext in READERS:  # .xls: openpyxl cannot stream it, read in one piece like load_transactions
+        chunks = [read_raw(path)]
+    else:
+        raise ValueError(f'unsupported transactions file: {path}')
+    for chunk in chunks:
+        # categories are set once on the final (small) result, chunk-level categories would not line up
+        yield prepare(chunk, categoricals=False)
+
+
+def _partial(chunk):
+    values = [c for c in NUMERIC if c in chunk.columns]
+    return chunk.groupby(DEDUP_KEY, sort=False)[values].sum()
+
+
+def _merge(acc, part):
+    if acc is None:
+        return part
+    return _merge_all([acc, part])
+
+
+def _merge_all(parts):
+    return pd.concat(parts).groupby(level=list(range(len(DEDUP_KEY))), sort=False).sum()
+
+
+def _finish(acc):
+    if acc is None:
+        raise ValueError('no transactions to aggregate')
+    new_df = acc.sort_index().reset_index()
+    for c in CATEGORICALS:
+        if c in new_df.columns:
+            new_df[c] = new_df[c].astype('category')
+    return new_df
+
+
+def _file_partial(path, chunksize):
+    """Partial sums of one file, read in chunks (runs in a worker)."""
+    acc = None
+    for chunk in iter_chunks(path, chunksize):
+        acc = _merge(acc, _partial(chunk))
+    return acc
+
+
+def stream_dedup(chunks):
+    """Build the dedup aggregation (``new_df`` before the drop) from an iterable of chunks."""
+    acc = None
+    for chunk in chunks:
+        acc = _merge(acc, _partial(chunk))
+    return _finish(acc)
+
+
+def parallel_dedup(source, chunksize=CHUNK_SIZE, max_workers=None):
+    """``stream_dedup`` of a file, directory or glob, one worker process per file.
+
+    Each worker returns the partial sums of its file; they are merged in one groupby here.
+    """
+    paths = expand_paths(source)
+    with stage('parallel_dedup', files=len(paths)) as s:
+        if len(paths) == 1:
+            parts = [_file_partial(paths[0], chunksize)]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                parts = list(pool.map(_file_partial, paths, [chunksize] * len(paths)))
+        parts = [p for p in parts if p is not None]
+        new_df = _finish(_merge_all(parts) if parts else None)
+        s.rows_out = new_df
+    return new_df
+
+
+def stream_aggregates(path, chunksize=CHUNK_SIZE, max_workers=None):
+    """Return ``(new_df, monthly)`` for a file, reading it in chunks of ``chunksize`` rows.
+
+    ``path`` can also be a directory or a glob; the files are then reduced in parallel
+    (``parallel_dedup``). The monthly sums are derived from the group partials, so the rows
+    with a missing key are excluded exactly like in the in-memory path.
+    """
+    new_df = parallel_dedup(path, chunksize, max_workers)
+    return new_df, monthly_sums(new_df)
+
+
+def _file_comoments(path, chunksize):
+    from .comoments import CoMoments
+    from .encoding import encode
+
+    acc = _file_partial(path, chunksize)
+    if acc is None:
+        return CoMoments()
+    new_df = _finish(acc).drop(['Discount Band', DATE], axis=1)
+    return CoMoments.from_batch(encode(new_df, ['Segment', 'Country', 'Product']))
+
+
+def stream_comoments(source, chunksize=CHUNK_SIZE, max_workers=None):
+    """Co-moments of the encoded ``new_df`` (what ``new_df.corr()`` is computed from), file by file.
+
+    Each file is deduplicated, encoded and reduced in a worker; the main process merges the
+    accumulators. Exact when no DEDUP_KEY group spans two files, which holds for exports split
+    by country and/or month (both are part of the key).
+    """
+    from .comoments import CoMoments
+
+    paths = expand_paths(source)
+    with stage('stream_comoments', files=len(paths)):
+        if len(paths) == 1:
+            parts = [_file_comoments(paths[0], chunksize)]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                parts = list(pool.map(_file_comoments, paths, [chunksize] * len(paths)))
+        acc = CoMoments()
+        for part in parts:
+            acc.merge(part)
+    return acc
@@ -0,0 +1,147 @@
+"""Synthetic transactions shaped like the Financial Sample workbook.
+
+Same columns, dimensions and Discount Band labels, with consistent identities:
+Gross Sales = Units Sold * Sale Price, Sales = Gross Sales - Discounts, Profit = Sales - COGS.
+Money is rounded to cents. Used by the benchmarks to run every stage at any size.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .schema import DATE, SALES
+
+SEGMENTS = ['Government', 'Midmarket', 'Channel Partners', 'Enterprise', 'Small Business']
+COUNTRIES = ['Canada', 'Germany', 'France', 'Mexico', 'United States of America']
+PRODUCTS = {'Carretera': 3, 'Montana': 5, 'Paseo': 10, 'Velo': 120, 'VTT': 250, 'Amarilla': 260}  # manufacturing price
+SALE_PRICES = np.array([7, 12, 15, 20, 125, 300, 350])
+BANDS = [('None', 0.0, 0.0), ('Low', 0.01, 0.05), ('Medium', 0.05, 0.10), ('High', 0.10, 0.15)]
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September',
+               'October', 'November', 'December']
+CHUNK = 250_000  # rows generated at a time: about 100 MB of temporaries
+
+
+def _labels(codes, labels, missing=()):
+    """Categorical of ``labels[codes]`` with sorted categories, ``missing`` labels as NaN."""
+    labels = np.asarray(labels)
+    keep = np.sort(labels[~np.isin(labels, missing)])
+    position = np.searchsorted(keep, labels)
+    position[np.isin(labels, missing)] = -1
+    return pd.Categorical.from_codes(position[codes], keep)
+
+
+def _chunk(rng, n, start_year, months, products, countries, categoricals=True):
+    product = rng.integers(0, len(products), n)
+    band = rng.integers(0, len(BANDS), n)
+    month = rng.integers(0, months, n)
+    units = np.round(rng.uniform(200, 4500, n) * 2) / 2
+    price = SALE_PRICES[rng.integers(0, len(SALE_PRICES), n)]
+    lo = np.array([b[1] for b in BANDS])[band]
+    hi = np.array([b[2] for b in BANDS])[band]
+    rate = rng.uniform(lo, hi)
+    manufacturing = np.array(list(products.values()))[product]
+    # work in cents so that the identities hold exactly before converting back
+    gross = np.round(units * price * 100).astype(np.int64)
+    discounts = np.round(gross * rate).astype(np.int64)
+    sales = gross - discounts
+    cogs = np.round(units * np.minimum(manufacturing, price * 0.9) * 100).astype(np.int64)
+    year = start_year + month // 12
+    month_number = month % 12 + 1
+    segment = rng.integers(0, len(SEGMENTS), n)
+    country = rng.integers(0, len(countries), n)
+    bands = [b[0] for b in BANDS]
+    if categoricals:  # codes straight into categoricals: no string column is ever materialised
+        dims = {
+            'Segment': _labels(segment, SEGMENTS),
+            'Country': _labels(country, countries),
+            'Product': _labels(product, list(products)),
+            'Discount Band': _labels(band, bands, missing=['None']),  # 'None' is NaN once read by pandas
+        }
+    else:
+        dims = {
+            'Segment': np.array(SEGMENTS)[segment],
+            'Country': np.array(countries)[country],
+            'Product': np.array(list(products))[product],
+            'Discount Band': np.array(bands)[band],
+        }
+    return pd.DataFrame({
+        **dims,
+        'Units Sold': units,
+        'Manufacturing Price': manufacturing,
+        'Sale Price': price,
+        'Gross Sales': gross / 100,
+        'Discounts': discounts / 100,
+        SALES: sales / 100,
+        'COGS': cogs / 100,
+        'Profit': (sales - cogs) / 100,
+        DATE: ((year - 1970) * 12 + month_number - 1).astype('datetime64[M]').astype('datetime64[us]'),
+        'Month Number': month_number,
+        'Month Name': pd.Categorical.from_codes(month_number - 1, MONTH_NAMES) if categoricals
+        else np.array(MONTH_NAMES)[month_number - 1],
+        'Year': year,
+    })
+
+
+def iter_transactions(rows, seed=0, start_year=2013, months=24, extra_products=0, extra_countries=0,
+                      chunk_size=CHUNK, categoricals=True):
+    """Yield ``rows`` synthetic transactions in chunks of at most ``chunk_size`` rows.
+
+    With ``categoricals`` the chunks are typed like ``ingest.load_transactions`` (categorical
+    dimensions with the same categories in every chunk, missing 'None' band); without, the
+    dimensions are strings as in the workbook. ``extra_products``/``extra_countries`` add
+    synthetic SKUs and countries, to test high cardinality.
+    """
+    rng = np.random.default_rng(seed)
+    products = dict(PRODUCTS)
+    products.update({f'SKU-{i:05d}': int(rng.integers(3, 261)) for i in range(extra_products)})
+    countries = COUNTRIES + [f'Country-{i:03d}' for i in range(extra_countries)]
+    done = 0
+    while done < rows:
+        n = min(chunk_size, rows - done)
+        yield _chunk(rng, n, start_year, months, products, countries, categoricals)
+        done += n
+
+
+def transactions(rows, categoricals=True, **kwargs):
+    """``rows`` synthetic transactions in one frame, typed like ``ingest.load_transactions``.
+
+    The chunks are copied into columns allocated once for all the rows, so the peak is the
+    frame plus one chunk: about 95 bytes per row with ``categoricals`` (Month Name is then
+    categorical too, as with ``compact=True``).
+    """
+    columns = None
+    done = 0
+    for chunk in iter_transactions(rows, categoricals=categoricals, **kwargs):
+        if columns is None:
+            columns = {c: np.empty(rows, dtype=chunk[c].cat.codes.dtype if isinstance(chunk[c].dtype, pd.CategoricalDtype)
+                                   else chunk[c].to_numpy().dtype) for c in chunk.columns}
+            categories = {c: chunk[c].cat.categories for c in chunk.columns
+                          if isinstance(chunk[c].dtype, pd.CategoricalDtype)}
+        for c, out in columns.items():
+            values = chunk[c].cat.codes if c in categories else chunk[c]
+            out[done:done + len(chunk)] = values.to_numpy()
+        done += len(chunk)
+    if columns is None:
+        return next(iter_transactions(1, categoricals=categoricals, **kwargs)).iloc[:0]
+    df = pd.DataFrame({c: pd.Categorical.from_codes(v, categories[c]) if c in categories else v
+                       for c, v in columns.items()}, copy=False)
+    if not categoricals:  # 'None' band is missing in the workbook once read by pandas
+        df['Discount Band'] = df['Discount Band'].where(df['Discount Band'] != 'None')
+    return df
+
+
+def write_parquet(path, rows, **kwargs):
+    """Write ``rows`` synthetic transactions to a parquet file one chunk at a time (one row group each)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in iter_transactions(rows, **kwargs):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
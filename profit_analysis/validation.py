@@ -0,0 +1,111 @@
+"""Single-pass data validation.
+
+Replaces the notebook's separate equality checks (each one a full boolean Series) with one
+blocked NumPy pass. Only the positions of the violating rows are kept, and the float
+identities are compared with a tolerance instead of ``==``.
+
+Rules:
+
+* ``gross_sales``: Units Sold * Sale Price == Gross Sales
+* ``cogs``: Sales - Profit == COGS
+* ``duplicates``: row identical to an earlier row (``df.duplicated()``)
+* ``key_duplicates``: rows sharing the dedup key (``df.duplicated(subset=col, keep=False)``)
+"""
+
+import numpy as np
+import pandas as pd
+
+from .instrument import stage
+from .schema import DEDUP_KEY, SALES, is_cents
+
+RULES = ['gross_sales', 'cogs', 'duplicates', 'key_duplicates']
+BLOCK = 1 << 20
+
+
+def _column(df, name):
+    values = np.asarray(df[name])
+    if values.dtype.kind in 'iu':  # int32 cents: widen so the differences cannot overflow
+        return values.astype('int64', copy=False)
+    return values if values.dtype.kind == 'f' and values.dtype.itemsize == 8 else values.astype('float64')
+
+
+def _identity_violations(df, rules, rtol, atol, block):
+    """Evaluate the arithmetic rules block by block, reusing the same scratch buffers.
+
+    With money in integer cents, Sales - Profit == COGS is checked exactly on the integers.
+    """
+    n = len(df)
+    scale = 100 if is_cents(df) else 1
+    found = {r: [] for r in rules}
+    cols = {}
+    if 'gross_sales' in rules:
+        cols['gross_sales'] = (_column(df, 'Units Sold'), _column(df, 'Sale Price'), _column(df, 'Gross Sales'))
+    if 'cogs' in rules:
+        cols['cogs'] = (_column(df, SALES), _column(df, 'Profit'), _column(df, 'COGS'))
+    lhs = np.empty(min(block, n))
+    tol = np.empty(min(block, n))
+    exact = np.empty(min(block, n), dtype=np.int64)
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        m = stop - start
+        for rule, (a, b, expected) in cols.items():
+            e = expected[start:stop]
+            if rule == 'cogs' and a.dtype.kind == b.dtype.kind == e.dtype.kind == 'i':
+                np.subtract(a[start:stop], b[start:stop], out=exact[:m])
+                bad = exact[:m] != e
+            else:
+                if rule == 'gross_sales':
+                    np.multiply(a[start:stop], b[start:stop], out=lhs[:m])
+                    lhs[:m] *= scale
+                else:
+                    np.subtract(a[start:stop], b[start:stop], out=lhs[:m])
+                np.subtract(lhs[:m], e, out=lhs[:m])
+                np.abs(lhs[:m], out=lhs[:m])
+                np.abs(e, out=tol[:m])
+                tol[:m] *= rtol
+                tol[:m] += atol * scale
+                # NaN on either side counts as a violation, like the notebook's == does
+                bad = ~(lhs[:m] <= tol[:m])
+            if bad.any():
+                found[rule].append(np.flatnonzero(bad) + start)
+    return {r: np.concatenate(v) if v else np.empty(0, dtype=np.intp) for r, v in found.items()}
+
+
+def _duplicate_positions(frame, keep):
+    """Positions of duplicated rows: hash every row once, confirm only the hash collisions exactly."""
+    hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    order = np.argsort(hashes, kind='stable')
+    same = hashes[order][1:] == hashes[order][:-1]
+    if not same.any():
+        return np.empty(0, dtype=np.intp)
+    candidates = np.zeros(len(frame), dtype=bool)
+    candidates[order[1:][same]] = True
+    candidates[order[:-1][same]] = True
+    candidates = np.flatnonzero(candidates)
+    dup = frame.iloc[candidates].duplicated(keep=keep).to_numpy()
+    return candidates[dup]
+
+
+def validate(df, rules=None, rtol=1e-9, atol=0.005, block=BLOCK):
+    """Run the validation rules on ``df`` and return ``{rule: positions of the violating rows}``.
+
+    ``rtol``/``atol`` are the tolerances of the arithmetic rules (|lhs - rhs| <= atol + rtol * |rhs|),
+    the default ``atol`` is half a cent (in currency units, also when money is stored in cents).
+    Positions are ``iloc`` positions.
+    """
+    rules = RULES if rules is None else list(rules)
+    unknown = set(rules) - set(RULES)
+    if unknown:
+        raise ValueError(f'unknown validation rules: {sorted(unknown)}')
+    with stage('validate', rows_in=df):
+        out = _identity_violations(df, [r for r in rules if r in ('gross_sales', 'cogs')], rtol, atol, block)
+        if 'duplicates' in rules:
+            out['duplicates'] = _duplicate_positions(df, keep='first')
+        if 'key_duplicates' in rules:
+            out['key_duplicates'] = _duplicate_positions(df[DEDUP_KEY], keep=False)
+    return {r: out[r] for r in rules}
+
+
+def counts(violations):
+    """Number of violating rows per rule."""
+    return pd.Series({r: len(v) for r, v in violations.items()}, name='violations', dtype='int64')
@@ -0,0 +1,191 @@
+"""What-if discount policies over the transactions, for many policies at once.
+
+A policy caps the discount ratio of the matching transactions::
+
+    {'cap': 5}                                        # every transaction at most 5% of Gross Sales
+    {'cap': 3, 'Product': 'VTT', 'Country': 'Canada'}  # VTT in Canada only
+    {'cap': 8, 'Segment': ['Enterprise', 'Government'], 'name': 'B2G'}
+
+A capped transaction keeps its Gross Sales and COGS, its Discounts fall to ``cap`` % of Gross
+Sales, and Sales and Profit are re-derived. With ``units_per_point`` the volume responds too:
+Units Sold (and with them Gross Sales and COGS) change by that fraction per percentage point of
+discount ratio added or removed.
+
+Everything that does not depend on the policy is done once, in ``Simulator(df)``: the discount
+ratio of every transaction, its bin (the notebook's ``[0, 2, 4, ..., 20]`` bins), and the rows
+sorted by (dims cell, bin, ratio) with prefix sums of the money columns. A cap then splits
+every (cell, bin) segment at one ``searchsorted`` position, and the segment totals come out of
+the prefix sums, so a policy costs O(segments x log rows) whatever the number of transactions.
+Policies are evaluated in vectorized batches.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .instrument import stage
+from .schema import DR_BIN_LABELS, DR_BINS, SALES
+
+DIMS = ['Segment', 'Country', 'Product']
+MEASURES = ['Units Sold', 'Gross Sales', 'Discounts', SALES, 'COGS', 'Profit']
+BATCH = 1 << 22  # policies x segments evaluated per batch
+
+
+def bin_codes(ratio, bins=DR_BINS):
+    """Bin of every discount ratio, right-closed like ``pd.cut``; the outer bins are open-ended."""
+    codes = np.searchsorted(np.asarray(bins, dtype='float64'), ratio, side='left') - 1
+    return np.clip(codes, 0, len(bins) - 2)
+
+
+class Simulator:
+    """Precomputed state for evaluating discount-cap policies on ``df`` (raw transactions)."""
+
+    def __init__(self, df, dims=DIMS, bins=DR_BINS, labels=DR_BIN_LABELS):
+        self.dims = list(dims)
+        self.bins = list(bins)
+        self.labels = list(labels) if labels is not None else [f'({a}, {b}]' for a, b in zip(bins[:-1], bins[1:])]
+        with stage('whatif_prepare', rows_in=df) as s:
+            self._prepare(df)
+            s.rows_out = self.n_segments
+
+    def _prepare(self, df):
+        gross = df['Gross Sales'].to_numpy(dtype='float64')
+        discounts = df['Discounts'].to_numpy(dtype='float64')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratio = np.where(gross != 0, discounts / gross * 100, 0.0)
+        bins = bin_codes(ratio, self.bins)
+
+        # cell: one code per combination of the dims present in the data
+        self.levels, dim_codes = {}, []
+        for d in self.dims:
+            cat = df[d].astype('category')
+            self.levels[d] = cat.cat.categories
+            dim_codes.append(cat.cat.codes.to_numpy().astype(np.int64) + 1)  # 0 is a missing value
+        sizes = [len(self.levels[d]) + 1 for d in self.dims]
+        combined = np.ravel_multi_index(dim_codes, sizes) if self.dims else np.zeros(len(df), dtype=np.int64)
+        cells, cell = np.unique(combined, return_inverse=True)
+        self.cell_codes = np.stack(np.unravel_index(cells, sizes)) - 1 if self.dims else np.empty((0, 1))
+
+        n_bins = len(self.bins) - 1
+        segment = cell.astype(np.int64) * n_bins + bins
+        order = np.lexsort((ratio, segment))
+        segment, ratio = segment[order], ratio[order]
+        segments, starts = np.unique(segment, return_index=True)
+        self.n_segments = len(segments)
+        self.seg_cell = segments // n_bins
+        self.seg_bin = segments % n_bins
+        self.start = starts
+        self.end = np.append(starts[1:], len(segment))
+
+        # one sorted key over all the segments: segment rank, then the ratio inside the segment
+        self.rmin = ratio.min() if len(ratio) else 0.0
+        self.span = (ratio.max() - self.rmin if len(ratio) else 0.0) + 1.0
+        rank = np.repeat(np.arange(self.n_segments), self.end - self.start)
+        self.key = rank * self.span + (ratio - self.rmin)
+
+        values = {m: df[m].to_numpy(dtype='float64')[order] for m in MEASURES}
+        columns = {m: values[m] for m in MEASURES}
+        for m in ['Units Sold', 'Gross Sales', 'COGS']:  # the terms of the volume response
+            columns['r*' + m] = ratio * values[m]
+        self.prefix = {m: np.concatenate([[0.0], np.cumsum(v)]) for m, v in columns.items()}
+        self.baseline = {m: self.prefix[m][self.end] - self.prefix[m][self.start] for m in MEASURES}
+
+    def _match(self, policies):
+        """(policies x cells) boolean: does the policy apply to the cell."""
+        match = np.ones((len(policies), self.cell_codes.shape[1]), dtype=bool)
+        for i, policy in enumerate(policies):
+            for d, wanted in policy.items():
+                if d in ('cap', 'name'):
+                    continue
+                if d not in self.levels:
+                    raise ValueError(f'unknown policy key {d!r}, expected cap, name or one of {self.dims}')
+                wanted = [wanted] if np.ndim(wanted) == 0 else list(wanted)
+                codes = self.levels[d].get_indexer(wanted)
+                match[i] &= np.isin(self.cell_codes[self.dims.index(d)], codes[codes >= 0])
+        return match
+
+    def _changes(self, policies, units_per_point, group, n_groups):
+        """Change of every measure per (policy, output group) under each policy.
+
+        Only the (policy, segment) pairs the policy applies to are searched and summed.
+        """
+        caps = np.array([p.get('cap', np.inf) for p in policies], dtype='float64')
+        pol, seg = np.nonzero(self._match(policies)[:, self.seg_cell] & np.isfinite(caps)[:, None])
+        cap = caps[pol]
+        start, end = self.start[seg], self.end[seg]
+        split = np.clip(np.searchsorted(self.key, seg * self.span + (cap - self.rmin), side='right'), start, end)
+        # sums over the capped rows (ratio above the cap) of every prefix-summed column
+        tail = {m: prefix[end] - prefix[split] for m, prefix in self.prefix.items()}
+        k = units_per_point / 100  # per percentage point, as a fraction
+        scale = 1 + k * cap  # sum((1 + k (cap - r)) x) = (1 + k cap) sum(x) - k sum(r x)
+        units = scale * tail['Units Sold'] - k * tail['r*Units Sold']
+        gross = scale * tail['Gross Sales'] - k * tail['r*Gross Sales']
+        cogs = scale * tail['COGS'] - k * tail['r*COGS']
+        discounts = gross * cap / 100
+        new = {
+            'Units Sold': units,
+            'Gross Sales': gross,
+            'Discounts': discounts,
+            SALES: gross - discounts,
+            'COGS': cogs,
+            'Profit': gross - discounts - cogs,
+        }
+        cell = pol * n_groups + group[seg]
+        size = len(policies) * n_groups
+        return {m: np.bincount(cell, weights=new[m] - tail[m], minlength=size).reshape(len(policies), n_groups)
+                for m in MEASURES}
+
+    def _groups(self, by):
+        """Output group of every segment (``by`` dims then bin) and the frame of the group labels."""
+        n_bins = len(self.bins) - 1
+        parts = [self.cell_codes[self.dims.index(d)][self.seg_cell] for d in by] + [self.seg_bin]
+        keys, group = np.unique(np.stack(parts), axis=1, return_inverse=True)
+        labels = {}
+        for i, d in enumerate(by):
+            codes = keys[i]
+            labels[d] = np.where(codes >= 0, np.asarray(self.levels[d], dtype=object)[np.maximum(codes, 0)], None)
+        labels['bins'] = pd.Categorical.from_codes(keys[-1], categories=self.labels[:n_bins])
+        return group.ravel(), pd.DataFrame(labels)
+
+    def simulate(self, policies, by=(), units_per_point=0.0, batch=BATCH):
+        """Totals per policy, ``by`` dims and discount-ratio bin, with the change in Profit against no policy.
+
+        ``by`` can be any of the simulator's dims. Returns a long frame: Policy, *by, bins, the
+        money columns, Profit change. See ``surface`` for the policy x bin table.
+        """
+        policies = [dict(p) for p in policies]
+        by = [by] if isinstance(by, str) else list(by)
+        unknown = [d for d in by if d not in self.dims]
+        if unknown:
+            raise ValueError(f'unknown dims {unknown}, expected some of {self.dims}')
+        group, labels = self._groups(by)
+        n_groups = len(labels)
+        base = {m: np.bincount(group, weights=self.baseline[m], minlength=n_groups) for m in MEASURES}
+        totals = {m: np.empty((len(policies), n_groups)) for m in MEASURES}
+        step = max(1, batch // max(self.n_segments, 1))
+        with stage('whatif', rows_in=len(policies)):
+            for lo in range(0, len(policies), step):
+                changes = self._changes(policies[lo:lo + step], units_per_point, group, n_groups)
+                for m in MEASURES:
+                    totals[m][lo:lo + step] = base[m] + changes[m]
+        names, seen = [], {}
+        for p in policies:  # unique names, surface() pivots on them
+            name = p.get('name') or _describe(p)
+            seen[name] = seen.get(name, 0) + 1
+            names.append(name if seen[name] == 1 else f'{name} #{seen[name]}')
+        out = pd.concat([labels] * len(policies), ignore_index=True)
+        out.insert(0, 'Policy', np.repeat(names, n_groups))
+        for m in MEASURES:
+            out[m] = totals[m].ravel()
+        out['Profit change'] = out['Profit'] - np.tile(base['Profit'], len(policies))
+        return out
+
+
+def _describe(policy):
+    where = ', '.join(f'{k}={v}' for k, v in policy.items() if k not in ('cap', 'name'))
+    cap = f"cap {policy['cap']:g}%" if 'cap' in policy else 'no cap'
+    return f'{cap} ({where})' if where else cap
+
+
+def surface(result, value='Profit'):
+    """Policy x bin table of ``value`` from ``Simulator.simulate`` (summed over the ``by`` dims)."""
+    return result.pivot_table(index='Policy', columns='bins', values=value, aggfunc='sum', sort=False, observed=False)
@@ -31,18 +31,25 @@ Original file is located at
 # **Data Preparation**
 """
 
-from google.colab import drive
-drive.mount('/content/drive')
-
-import os
-os.listdir('/content/drive/My Drive/Colab Notebooks')
+# On Colab the workbook lives on Drive, anywhere else it is read from the working directory.
+# (The same stages are available without the notebook: profit-analysis kpis|eda|ols|importance|report)
+try:
+    from google.colab import drive
+    drive.mount('/content/drive')
+    DATA_PATH = '/content/drive/My Drive/Colab Notebooks/Financial Sample.xlsx'
+except ImportError:
+    DATA_PATH = 'Financial Sample.xlsx'
 
 import pandas as pd
+from profit_analysis import load_transactions
 
-df=pd.read_excel("/content/drive/My Drive/Colab Notebooks/Financial Sample.xlsx")
+# The workbook is parsed once and cached as Arrow next to it, later runs just memory-map the cache.
+# Column names are cleaned on the way in (the sales column was ' Sales', with a space!!), 'Date' is parsed and
+# Segment, Country, Product and Discount Band are categoricals.
+df=load_transactions(DATA_PATH)
 df
 
-df.columns  #The name of sales column starts with a space!!
+df.columns
 
 df.info()  #To check the type of data and NaN values
 
@@ -57,24 +64,32 @@ df.groupby("Discount Band")["Discounts"].agg(["min", "max", "mean"])
 ## **Duplicates**:
 """
 
-df.duplicated().value_counts()
+from profit_analysis.validation import validate, counts
+
+# All the integrity rules (duplicates, Units Sold*Sale Price=Gross Sales, Sales-Profit=COGS) are checked in one pass,
+# only the positions of the rows breaking a rule are kept.
+violations = validate(df)
+counts(violations)
 
-"""There are no duplicates, since all values of the previous result are False.
+"""There are no duplicates, since the count of the 'duplicates' rule is 0.
 
 The following code checks if any rows have the same segment, country, discount band, product, date, month number, and year. If so, it creates a list of their indices.
 """
 
 col=['Segment', 'Country', 'Discount Band', 'Product', 'Date','Month Number', 'Year']
 
-duplicates = df.duplicated(subset=col, keep=False)
-index = [df.index[duplicates]]
+index = [df.index[violations['key_duplicates']]]
 index
 
 """There are some duplicates, which can be explained by selling different versions of the same product at different prices on the same day in the same country and segment. To avoid redundancy, we can sum the remaining values (aggregation)."""
 
-new_df=df.groupby(col).sum().reset_index()
+new_df=df.groupby(col, observed=True).sum().reset_index()
 new_df.head()
 
+# For exports that don't fit in memory, the same new_df (without Month Name) and the monthly sums can be built
+# chunk by chunk: new_df, monthly_totals = profit_analysis.stream.stream_aggregates(path)
+# path can be a directory or glob of monthly exports; each file is then reduced in its own worker process
+
 """
 
 The **Date** column is already in datetime format! But there is a redundancy when it come to dates. The three separate columns (day, month, and year) essentially repeat the same information. Also because ALL days are the first of the month! For our profit analysis, we only really need the year and month for the trend analysis.
@@ -89,9 +104,10 @@ new_df.drop(['Discount Band','Month Name','Date'],inplace=True,axis=1)
 """**The following code will checks whether all numerical values are correct using the formulas of sales, profit and COGS.**"""
 
 import numpy as np
-(new_df['Units Sold']*new_df['Sale Price']==new_df['Gross Sales']).value_counts()
+checks = validate(new_df, rules=['gross_sales', 'cogs'])  # half a cent tolerance instead of exact float equality
+counts(checks)
 
-new_df[(new_df['Units Sold']*new_df['Sale Price']!=new_df['Gross Sales'])].head()
+new_df.iloc[checks['gross_sales']].head()
 
 """The previous code shows some rows where Units sold multiplied by the Sale price does not equal the Gross profit, This is because these rows contain the same product, but different prices. For example :"""
 
@@ -99,11 +115,9 @@ df.iloc[[543,585]]
 
 """**Checking the relationship between Sales, Profit and COGS(Cost of goods sold):**"""
 
-(new_df[' Sales'] - new_df['Profit']==new_df['COGS']).value_counts()
-
-new_df[(new_df[' Sales'] - new_df['Profit']!=new_df['COGS'])].head()
+new_df.iloc[checks['cogs']].head()
 
-"""It seems that these values are correct based on manual calculation, as Sales equals Profit plus COGS.
+"""No row breaks this rule, Sales equals Profit plus COGS. (With an exact == a few rows looked wrong, but that was only float rounding.)
 
 ## **Dummy variables**
 
@@ -114,12 +128,14 @@ print(new_df['Country'].unique()) # 5 values
 print(new_df['Segment'].unique()) # 5 values
 print(new_df['Product'].unique()) # 6 values
 
-"""Since the dataset is small, working with pandas and get_dummies is a good choice."""
+"""The dataset is small, but with real customer and product cardinality get_dummies would create thousands of mostly-zero columns. So the three columns are kept as integer category codes, the dummy (one-hot) columns are only built as a sparse matrix when a stage needs them. The column names are the same as with get_dummies."""
 
-new_df=pd.get_dummies(new_df,columns=['Segment','Country','Product'], dtype=int)
+from profit_analysis.encoding import encode
+
+new_df=encode(new_df, ['Segment','Country','Product'])
 new_df.head()
 
-new_df.info() # To make sure all values are numerical and ready for future analysis and modeling.
+new_df.numeric.info() # To make sure all values are numerical and ready for future analysis and modeling.
 
 """# **Financial KPIs (Trend Analysis):**
 
@@ -165,14 +181,14 @@ Discount Ratio helps understand how much the price is reduced on average, and ho
 \end{equation}
 """
 
-monthly=new_df.groupby(['Year', 'Month Number']).sum().reset_index()
-monthly=monthly[['Year','Month Number', 'Gross Sales','Discounts',' Sales','COGS','Profit']]
+monthly=new_df.numeric.groupby(['Year', 'Month Number']).sum().reset_index()
+monthly=monthly[['Year','Month Number', 'Gross Sales','Discounts','Sales','COGS','Profit']]
 monthly['Month-Year']=monthly['Month Number'].astype(str)+'-'+monthly['Year'].astype(str)
 monthly.drop(['Year', 'Month Number'],inplace=True,axis=1)
 monthly
 
-monthly['GPM']=(monthly['Profit']/monthly[' Sales'])*100 # Gross Profit Margin
-monthly['COGSM']=(monthly['COGS']/monthly[' Sales'])*100 # COGS Margin
+monthly['GPM']=(monthly['Profit']/monthly['Sales'])*100 # Gross Profit Margin
+monthly['COGSM']=(monthly['COGS']/monthly['Sales'])*100 # COGS Margin
 monthly['DR']=(monthly['Discounts']/monthly['Gross Sales'])*100 # Discount Ratio
 monthly
 
@@ -246,11 +262,17 @@ In this section, we'll analyze feature relationships with Profit through the hea
 ### **Correlation Heatmap :**
 """
 
-correlation_matrix = new_df.corr()
+import seaborn as sns
+from profit_analysis import memoize  # reruns on unchanged data read the result from .profit_cache/results
+
+correlation_matrix = memoize(new_df.corr)
 plt.figure(figsize = (8,6))
 sns.heatmap(correlation_matrix, cmap = 'coolwarm')
 plt.show()
 
+# To keep these correlations current as months are appended, accumulate the co-moments instead of recomputing:
+# acc = profit_analysis.comoments.CoMoments.from_batch(new_df); acc.update(next_month); acc.corr_with('Profit')
+# (profit_analysis.stream.stream_comoments(path) builds the same accumulator from a directory of exports in parallel)
 correlation_matrix['Profit'].sort_values(ascending=False) #Since the aim of these analysis is to have a clear picture of the profiability of the company.
 
 """*  The strongest positive correlations with Profit come from:
@@ -287,9 +309,16 @@ import statsmodels.api as sm
 X = new_df[['Discounts']]
 X = sm.add_constant(X)
 y = new_df['Profit']
-model = sm.OLS(y, X).fit()
+model = memoize(lambda y, X: sm.OLS(y, X).fit(), y, X)
 print(model.summary())
 
+# The same regression for every Segment x Country x Product slice, solved at once from grouped sums
+# (n, Σx, Σy, Σxy, Σx², Σy²) instead of one statsmodels model per slice.
+from profit_analysis.regression import batched_ols
+
+slices = batched_ols(new_df, x='Discounts', y='Profit', by=['Segment', 'Country', 'Product'])
+slices.sort_values('r2', ascending=False).head(10)
+
 """1. **Interpretation of R-squared (17.5%):**
 
   17.5% of the variation in profit is explained by discounts. This relatively low value indicates that:
@@ -351,6 +380,15 @@ plt.bar(bin['bins'],bin['Profit'], width = 0.2)
 plt.xlabel('Discount Ratio')
 plt.ylabel('Profit')
 
+# What-if: profit per discount bin if the discount ratio were capped, per transaction, for many policies at once.
+# The ratios, bins and prefix sums are computed once by the Simulator; each policy is then a few searchsorted calls.
+from profit_analysis.whatif import Simulator, surface
+
+simulator = Simulator(df)
+policies = [{'cap': cap} for cap in (2, 4, 6, 8, 10)] + [{'cap': 4, 'Product': 'VTT', 'Country': 'Canada'}]
+what_if = simulator.simulate(policies)
+surface(what_if)
+
 """Fantastic! Now we have a clear picture of the safest discount range that increases profit. The analysis shows discounts closest to **4-8%** of gross sales tend to give better results. However, some lower profits still occur within this range (especially 6-8%) as shown in the *Profit over Discount Ratio* barplot, indicating other influencing factors, for example, product differences (some products respond better to discounts than others) and seasonal trends (certain months outperform others even with identical discounts).
 
 ####Discount Elasticity :
@@ -368,25 +406,37 @@ $$
 The optimal discount range will be where Elasticity is highest but still positive.
 """
 
-monthly['Profit_Change'] = monthly['Profit'].pct_change()
-monthly['DR_Change'] = monthly['DR'].pct_change()
+from profit_analysis.elasticity import elasticities, optimal_discount, period_sums
 
-monthly['Discount_Elasticity'] = monthly['Profit_Change'] / monthly['DR_Change']
+# %ΔProfit / %ΔDR, but months where DR moves by less than 1% get no elasticity (instead of a huge or infinite ratio).
+# LogLog_Elasticity is the slope of log(Profit) on log(DR) over the last 6 months, a steadier estimate.
+monthly = elasticities(monthly)
 
-optimal_index = monthly['Discount_Elasticity'].idxmax()
-optimal_discount_ratio = monthly.loc[optimal_index, 'DR']
-optimal_profit = monthly.loc[optimal_index, 'Profit']
+optimal = optimal_discount(monthly)
+optimal_discount_ratio = optimal.loc[0, 'DR']
+optimal_profit = optimal.loc[0, 'Profit']
 print(f"The optimal discount ratio is {optimal_discount_ratio:.2f}% with a profit of {optimal_profit:.2f}$")
 monthly['Discount_Elasticity']
 
+# The same thing for every Country x Product at once, without a loop over the groups
+by_country_product = elasticities(period_sums(new_df, ['Country', 'Product']), ['Country', 'Product'])
+optimal_discount(by_country_product, ['Country', 'Product'])
+
 """Most of the data shows negative elasticity, which means discounting has a negative impact on profit, except for two values: one between 0 and 1 (indicating a weak positive effect of discounting), and another higher than 1 which is the optimal value for maximizing profit, corresponding to a discount ratio of **8.12%**.
 
 ### Profit by Segment :
 """
 
+from profit_analysis.cube import Cube
+
+# count, sum and sum of squares per Segment x Country x Product x Month are computed once,
+# every total/mean/std/count below is a roll-up of this cube instead of a new scan of df.
+cube = Cube.from_frame(df)
+
 #plot of profit by segments
+profit_segment = cube.rollup('Segment', 'Profit', 'sum').reset_index()
 plt. figure(figsize=(8,6))
-plt.bar(df['Segment'], df['Profit'], color="#468eb8")
+plt.bar(profit_segment['Segment'], profit_segment['Profit'], color="#468eb8")
 plt.xlabel('Segment')
 plt.ylabel('Profit')
 plt.title('Total Profit by Segment')
@@ -397,7 +447,7 @@ plt.show()
 ### Profit by Country :
 """
 
-profit_country = df.groupby('Country')['Profit'].sum().reset_index()
+profit_country = cube.rollup('Country', 'Profit', 'sum').reset_index()
 plt. figure(figsize=(8,6))
 plt.bar(profit_country['Country'], profit_country['Profit'], color='#e37029')
 plt.xlabel('Country')
@@ -407,7 +457,7 @@ plt.show()
 
 """The plot shows France is the most profitable, followed by Germany and Canada. The United States and Mexico are the least profitable. This reveals some surprising patterns. These differences likely come from country-specific tax rules and business regulations, which vary significantly across markets."""
 
-avg_profit_country = df.groupby('Country')['Profit'].mean().reset_index()
+avg_profit_country = cube.rollup('Country', 'Profit', 'mean').reset_index()
 plt. figure(figsize=(8,6))
 plt.bar(avg_profit_country['Country'], avg_profit_country['Profit'],color='#f59458')
 plt.xlabel('Country')
@@ -416,7 +466,7 @@ plt.title('Average Profit by Coutry')
 
 """The plot shows France is the most profitable, followed by Germany and Canada. The United States and Mexico are the least profitable. This matches what we see in the total profit."""
 
-std_profit_country = df.groupby('Country')['Profit'].std().reset_index()
+std_profit_country = cube.rollup('Country', 'Profit', 'std').reset_index()
 plt. figure(figsize=(8,6))
 plt.bar(std_profit_country['Country'], std_profit_country['Profit'],color='#eba275')
 plt.xlabel('Country')
@@ -435,7 +485,7 @@ Germany, France and Canada have higher variance in profit, meaning some sales br
 To make sure all the previous parameters( total,mean and variance in profit ) aren't affected by any other variable we will look at the number of transactions per country, which seem to be the same!
 """
 
-count_profit_country = df.groupby('Country')['Profit'].count().reset_index()
+count_profit_country = cube.rollup('Country', 'Profit', 'count').reset_index()
 count_profit_country
 
 """Final review:
@@ -446,7 +496,7 @@ count_profit_country
 ###Profit by Product:
 """
 
-profit_prod = df.groupby('Product')['Profit'].sum().reset_index()
+profit_prod = cube.rollup('Product', 'Profit', 'sum').reset_index()
 plt.bar(profit_prod['Product'], profit_prod['Profit'], color='#6cc4a1')
 plt.xlabel('Product')
 plt.ylabel('Total Profit')
@@ -471,7 +521,7 @@ The goal of this part is to identify which features are linked to high and low p
 ### Random Forest Model:
 """
 
-new_df['Profit margin']=(new_df['Profit']/new_df[' Sales'])*100 # working with profit margin is more efficient for analyzing profitability
+new_df['Profit margin']=(new_df['Profit']/new_df['Sales'])*100 # working with profit margin is more efficient for analyzing profitability
 new_df.columns
 
 from sklearn.ensemble import RandomForestRegressor
@@ -479,10 +529,9 @@ from sklearn.model_selection import train_test_split
 X=new_df.drop(['Profit', 'Year','Profit margin'], axis=1) #Independant variables
 y = new_df["Profit margin"] # The target
 
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=10)
+X_train, X_test, y_train, y_test = train_test_split(X.to_csr(), y, test_size=0.2, random_state=10) # sparse one-hot, the forest accepts CSR
 
-model = RandomForestRegressor(n_estimators=100, random_state=10)
-model.fit(X_train, y_train)
+model = memoize(RandomForestRegressor(n_estimators=100, random_state=10).fit, X_train, y_train)
 
 importance = model.feature_importances_
 feature_importance = pd.DataFrame({
@@ -491,6 +540,14 @@ feature_importance = pd.DataFrame({
 
 print(feature_importance.head(24))
 
+# Impurity importances are biased towards features with many split points. The same forest can be refitted per
+# country (or segment, or year) on a process pool, with out-of-bag R2 and permutation importances on held-out rows.
+from profit_analysis.importance import feature_importances, groups_of
+
+importances, runs = feature_importances(X.to_codes(), y, X.code_columns, groups=groups_of(new_df, 'Country'))
+print(runs)
+importances.sort_values(['Group', 'Permutation'], ascending=[True, False]).groupby('Group').head(5)
+
 """*  Channel Partners alone drive ~60% of profit impact, with Enterprise clients adding another 5%.
 * COGS (18%) and Sale Price (13%) together account for nearly a third of profit influence. The less it is the better.
 *  Surprisingly, discounts barely matter (1.5%).Pricing is more important than  discounting for boosting profitability.
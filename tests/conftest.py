@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+from profit_analysis.ingest import load_transactions
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Financial Sample.xlsx')
+
+
+@pytest.fixture(scope='session')
+def sample():
+    """Path of the sample workbook."""
+    return SAMPLE
+
+
+@pytest.fixture(scope='session')
+def transactions():
+    """The prepared sample transactions (do not modify)."""
+    return load_transactions(SAMPLE, use_cache=False)
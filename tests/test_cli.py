@@ -0,0 +1,31 @@
+import io
+
+import pandas as pd
+import pytest
+
+from profit_analysis.cli import _where, main
+
+
+def _eda(capsys, *argv):
+    main(['eda', *argv, '--by', 'Country', '--format', 'csv'])
+    return pd.read_csv(io.StringIO(capsys.readouterr().out))
+
+
+def test_where_values_are_typed_like_the_column():
+    where = _where(['Sales=5,6.5', 'Year=2014', 'Date=2014-06-01', 'Country=Canada,France'])
+    assert where == {'Sales': [5.0, 6.5], 'Year': [2014], 'Date': [pd.Timestamp('2014-06-01')],
+                     'Country': ['Canada', 'France']}
+    with pytest.raises(SystemExit):
+        _where(['Year=x'])
+    with pytest.raises(SystemExit):
+        _where(['Nope=1'])
+
+
+def test_numeric_where_on_a_store_and_a_file(tmp_path, capsys, sample, transactions):
+    store = str(tmp_path / 'store')
+    main(['store', sample, store])
+    sales = float(transactions['Sales'].iloc[0])
+    expected = transactions[transactions['Sales'] == sales].groupby('Country', observed=True)['Profit'].sum()
+    for source in (store, sample):
+        got = _eda(capsys, source, '--where', f'Sales={sales!r}').set_index('Country')['Profit']
+        pd.testing.assert_series_equal(got, expected, check_index_type=False, check_categorical=False)
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from profit_analysis.comoments import CoMoments
+from profit_analysis.encoding import encode
+from profit_analysis.pipeline import dedup
+from profit_analysis.stream import stream_comoments
+
+DIMS = ['Segment', 'Country', 'Product']
+
+
+def _new_df(transactions):
+    return dedup(transactions).drop(['Discount Band', 'Date'], axis=1)
+
+
+def _expected(transactions):
+    return pd.get_dummies(_new_df(transactions), columns=DIMS, dtype=int).corr()
+
+
+def _close(corr, expected):
+    assert sorted(corr.columns) == sorted(expected.columns)
+    np.testing.assert_allclose(corr.loc[expected.index, expected.columns], expected, atol=1e-12)
+
+
+def test_monthly_merges_match_get_dummies_corr(transactions):
+    acc = CoMoments()
+    for _, month in _new_df(transactions).groupby(['Year', 'Month Number'], observed=True):
+        acc.update(encode(month.reset_index(drop=True), DIMS))
+    expected = _expected(transactions)
+    _close(acc.corr(), expected)
+    np.testing.assert_allclose(acc.corr_with('Profit')[expected.index], expected['Profit'], atol=1e-12)
+
+
+def test_merging_workers_and_reloading(tmp_path, transactions):
+    new_df = _new_df(transactions)
+    halves = [CoMoments.from_batch(encode(part.reset_index(drop=True), DIMS))
+              for part in (new_df.iloc[::2], new_df.iloc[1::2])]
+    path = str(tmp_path / 'comoments.arrow')
+    halves[0].save(path)
+    acc = CoMoments.load(path).merge(halves[1])
+    _close(acc.corr(), _expected(transactions))
+
+
+def test_stream_comoments_matches(sample, transactions):
+    _close(stream_comoments(sample).corr(), _expected(transactions))
@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+
+from profit_analysis.cube import Cube
+from profit_analysis.synthetic import transactions as synthetic_transactions
+
+
+@pytest.mark.parametrize('by', [('Country',), ('Country', 'Product'), ('Segment', 'Country', 'Product', 'Year', 'Month Number')])
+@pytest.mark.parametrize('stat', ['count', 'sum', 'mean', 'std'])
+def test_rollup_matches_groupby(transactions, by, stat):
+    got = Cube.from_frame(transactions).rollup(by, 'Profit', stat)
+    expected = transactions.groupby(list(by), observed=True)['Profit'].agg(stat)
+    pd.testing.assert_series_equal(got, expected.rename('Profit'), check_dtype=False, check_index_type=False)
+
+
+def test_filtered_rollup_matches_groupby(transactions):
+    got = Cube.from_frame(transactions).rollup(('Country', 'Product'), 'Sales', 'sum', where={'Year': 2014})
+    expected = transactions[transactions['Year'] == 2014].groupby(['Country', 'Product'], observed=True)['Sales'].sum()
+    pd.testing.assert_series_equal(got, expected, check_index_type=False)
+
+
+def test_groups_follow_the_populated_cells():
+    df = synthetic_transactions(20_000, extra_products=2000, extra_countries=40)
+    cube = Cube.from_frame(df)
+    by = ('Segment', 'Country', 'Product', 'Year', 'Month Number')
+    key, index = cube._group(by)
+    assert len(index) == len(cube)  # not 5 x 45 x 2006 x 2 x 12
+    pd.testing.assert_series_equal(cube.rollup(by), df.groupby(list(by), observed=True)['Profit'].sum(),
+                                   check_index_type=False)
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from profit_analysis.encoding import encode
+from profit_analysis.pipeline import dedup
+
+DIMS = ['Segment', 'Country', 'Product']
+
+
+@pytest.fixture
+def new_df(transactions):
+    new_df = dedup(transactions).drop(['Discount Band', 'Date'], axis=1)
+    # a category without rows (all-zero dummy, NaN correlations) and a row without a Product
+    new_df['Country'] = new_df['Country'].cat.add_categories(['Atlantis'])
+    new_df.loc[0, 'Product'] = np.nan
+    return new_df
+
+
+def test_to_dense_is_get_dummies(new_df):
+    expected = pd.get_dummies(new_df, columns=DIMS, dtype=int)
+    assert (expected['Country_Atlantis'] == 0).all()
+    pd.testing.assert_frame_equal(encode(new_df, DIMS).to_dense(), expected, check_dtype=False)
+
+
+def test_corr_is_get_dummies_corr(new_df):
+    expected = pd.get_dummies(new_df, columns=DIMS, dtype=int).corr()
+    got = encode(new_df, DIMS).corr()
+    assert got['Country_Atlantis'].isna().all()
+    pd.testing.assert_frame_equal(got.loc[expected.index, expected.columns], expected, atol=1e-12, rtol=0,
+                                  check_exact=False)
@@ -0,0 +1,48 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from profit_analysis.ingest import load_transactions
+from profit_analysis.schema import CATEGORICALS
+
+
+def test_unwritable_cache_falls_back_to_parsing(tmp_path, sample, transactions):
+    blocker = tmp_path / 'not-a-directory'
+    blocker.write_text('')
+    df = load_transactions(sample, cache_dir=str(blocker / 'cache'))
+    pd.testing.assert_frame_equal(df, transactions)
+
+
+def test_rewritten_file_replaces_its_old_cache(tmp_path, sample):
+    path = tmp_path / 'sample.xlsx'
+    shutil.copy(sample, path)
+    cache = tmp_path / 'cache'
+    load_transactions(str(path), cache_dir=str(cache))
+    load_transactions(str(path), cache_dir=str(cache), compact=True)
+    os.utime(path, ns=(0, 0))  # same content, new mtime: a new cache key
+    load_transactions(str(path), cache_dir=str(cache))
+    assert len(os.listdir(cache)) == 2  # one per variant
+
+
+@pytest.fixture(scope='module')
+def exports(tmp_path_factory, sample):
+    """The sample split into one workbook per Country and Year (different categories in every file)."""
+    directory = tmp_path_factory.mktemp('exports')
+    raw = pd.read_excel(sample)
+    for (country, year), part in raw.groupby(['Country', 'Year']):
+        part.to_excel(directory / f'{country}-{year}.xlsx', index=False)
+    return directory
+
+
+def _sorted(df):
+    return df.sort_values(list(df.columns), ignore_index=True, kind='stable')
+
+
+@pytest.mark.parametrize('use_cache', [True, False])
+def test_directory_equals_the_single_file(tmp_path, exports, transactions, use_cache):
+    df = load_transactions(str(exports), cache_dir=str(tmp_path / 'cache'), use_cache=use_cache, max_workers=2)
+    for c in CATEGORICALS:
+        assert isinstance(df[c].dtype, pd.CategoricalDtype), c
+    pd.testing.assert_frame_equal(_sorted(df), _sorted(transactions), check_categorical=False)
@@ -0,0 +1,35 @@
+import os
+
+import numpy as np
+
+from profit_analysis import instrument
+
+
+def test_nested_stages_get_their_own_profile_and_peak(tmp_path):
+    recorder = instrument.enable(profile=True, profile_dir=str(tmp_path), trace_memory=True)
+    try:
+        with instrument.stage('outer'):
+            keep = np.ones(2_000_000)  # 16 MB held across the inner stage
+            with instrument.stage('inner'):
+                np.ones(1_000_000).sum()  # 8 MB, freed before the stage ends
+            del keep
+    finally:
+        instrument.disable()
+    records = recorder.last
+    assert sorted(os.listdir(tmp_path)) == ['inner-1.prof', 'outer-2.prof']
+    assert 7e6 < records['inner']['traced_peak_bytes'] < 9e6  # not counting the outer stage's 16 MB
+    assert records['outer']['traced_peak_bytes'] > 2.3e7  # its own 16 MB plus the inner peak
+
+
+def test_memory_does_not_grow_with_the_number_of_runs(tmp_path):
+    recorder = instrument.enable(metrics_path=str(tmp_path / 'stages.prom'))
+    try:
+        for i in range(1000):
+            with instrument.stage('query', endpoint='/kpis') as s:
+                s.rows_out = i
+    finally:
+        instrument.disable()
+    assert recorder.runs == {'query': 1000}
+    assert recorder.last['query']['rows_out'] == 999
+    metrics = (tmp_path / 'stages.prom').read_text()
+    assert 'profit_analysis_stage_runs_total{stage="query"} 1000' in metrics
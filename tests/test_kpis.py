@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from profit_analysis.kpis import KPIState
+from profit_analysis.pipeline import RATIOS, add_ratios, dedup, monthly_sums
+from profit_analysis.schema import MONEY, PERIOD
+
+
+def _months(transactions):
+    return [part for _, part in transactions.groupby(PERIOD, observed=True)]
+
+
+def test_monthly_updates_match_the_full_recompute(transactions):
+    state = KPIState()
+    for month in _months(transactions):
+        state.update(month)
+    expected = add_ratios(monthly_sums(dedup(transactions)))
+    got = state.monthly()
+    np.testing.assert_array_equal(got[PERIOD].to_numpy(), expected[PERIOD].to_numpy())
+    np.testing.assert_allclose(got[MONEY + RATIOS], expected[MONEY + RATIOS], rtol=1e-12)
+
+
+def test_save_load_round_trip_by_country(tmp_path, transactions):
+    path = str(tmp_path / 'kpi_state.arrow')
+    months = _months(transactions)
+    state = KPIState(by=['Country'])
+    for month in months[:-1]:
+        state.update(month)
+    state.save(path)
+
+    loaded = KPIState.load(path)
+    assert loaded.by == ['Country']
+    pd.testing.assert_frame_equal(loaded.table, state.table, check_index_type=False)
+    loaded.update(months[-1])  # the loaded state can still be updated
+
+    expected = add_ratios(dedup(transactions).groupby(PERIOD + ['Country'], observed=True)[MONEY].sum())
+    got = loaded.table.sort_index()
+    np.testing.assert_allclose(got[MONEY + RATIOS], expected[MONEY + RATIOS], rtol=1e-12)
+    assert list(got.index) == [(y, m, str(c)) for y, m, c in expected.index]
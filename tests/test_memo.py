@@ -0,0 +1,41 @@
+import numpy as np
+
+from profit_analysis.memo import ResultCache, code_version, memoize
+
+
+def test_lambdas_calling_different_names_do_not_collide(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    a = np.arange(10)
+    assert memoize(lambda a: np.max(a), a, cache=cache) == 9
+    assert memoize(lambda a: np.min(a), a, cache=cache) == 0
+
+
+def test_nested_code_changes_the_version():
+    def outer_max():
+        return lambda a: np.max(a)
+
+    def outer_min():
+        return lambda a: np.min(a)
+
+    outer_min.__qualname__ = outer_max.__qualname__
+    assert code_version(outer_max) != code_version(outer_min)
+
+
+def test_hit_returns_the_cached_result(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    calls = []
+
+    def f(x):
+        calls.append(x)
+        return x * 2
+
+    assert memoize(f, 3, cache=cache) == 6
+    assert memoize(f, 3, cache=cache) == 6
+    assert calls == [3]
+
+
+def test_unwritable_cache_returns_the_result(tmp_path):
+    blocker = tmp_path / 'not-a-directory'
+    blocker.write_text('')
+    cache = ResultCache(str(blocker / 'results'))
+    assert memoize(np.max, np.arange(10), cache=cache) == 9
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from profit_analysis.pipeline import dedup, model_frame
+from profit_analysis.regression import batched_ols
+
+sm = pytest.importorskip('statsmodels.api')
+
+
+def _check(row, fit):
+    np.testing.assert_allclose([row['beta0'], row['beta1']], fit.params, rtol=1e-9)
+    np.testing.assert_allclose([row['se_beta0'], row['se_beta1']], fit.bse, rtol=1e-9)
+    np.testing.assert_allclose([row['p_beta0'], row['p_beta1']], fit.pvalues, rtol=1e-6, atol=1e-300)
+    assert row['r2'] == pytest.approx(fit.rsquared, rel=1e-9)
+    assert row['n'] == fit.nobs
+
+
+def test_single_ols_matches_statsmodels(transactions):
+    new_df = model_frame(transactions)
+    row = batched_ols(new_df, by=()).iloc[0]
+    X = sm.add_constant(new_df['Discounts'].to_numpy(dtype='float64'))
+    _check(row, sm.OLS(new_df['Profit'].to_numpy(dtype='float64'), X).fit())
+
+
+def test_slice_matches_statsmodels(transactions):
+    new_df = dedup(transactions)
+    table = batched_ols(new_df, by=['Segment']).set_index('Segment')
+    part = new_df[new_df['Segment'] == 'Government']
+    X = sm.add_constant(part['Discounts'].to_numpy(dtype='float64'))
+    _check(table.loc['Government'], sm.OLS(part['Profit'].to_numpy(dtype='float64'), X).fit())
@@ -0,0 +1,104 @@
+import asyncio
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from profit_analysis import service
+from profit_analysis.pipeline import add_ratios, dedup, monthly_sums
+from profit_analysis.service import QueryService, get
+
+
+def _serve(path, test):
+    """Run ``await test(port, service)`` against a service on an ephemeral port."""
+    async def main():
+        svc = QueryService(str(path), reload_interval=0, use_cache=False)
+        server = await svc.start('127.0.0.1', 0)
+        try:
+            return await test(server.sockets[0].getsockname()[1], svc)
+        finally:
+            await svc.stop()
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def workbook(tmp_path, sample):
+    path = tmp_path / 'sample.xlsx'
+    shutil.copy(sample, path)
+    return path
+
+
+def test_kpis_and_slice_match_the_pipeline(workbook, transactions):
+    async def test(port, _):
+        return [await get('127.0.0.1', port, target) for target in
+                ['/kpis', '/slice?by=Country&stat=sum,mean', '/slice?by=Product&Year=2014&measure=Sales']]
+
+    (s1, kpis), (s2, country), (s3, product) = _serve(workbook, test)
+    assert s1 == s2 == s3 == 200
+    expected = add_ratios(monthly_sums(dedup(transactions)))
+    got = pd.DataFrame(kpis)
+    for c in ['Gross Sales', 'Discounts', 'Sales', 'COGS', 'Profit', 'GPM', 'COGSM', 'DR']:
+        np.testing.assert_allclose(got[c], expected[c], rtol=1e-9)
+    by_country = transactions.groupby('Country', observed=True)['Profit'].agg(['sum', 'mean'])
+    got = pd.DataFrame(country).set_index('Country')
+    np.testing.assert_allclose(got.loc[by_country.index, ['sum', 'mean']], by_country, rtol=1e-9)
+    sales = transactions[transactions['Year'] == 2014].groupby('Product', observed=True)['Sales'].sum()
+    got = pd.DataFrame(product).set_index('Product')['Sales']
+    np.testing.assert_allclose(got[sales.index], sales, rtol=1e-9)
+
+
+def test_concurrent_duplicates_compute_once(workbook, monkeypatch):
+    calls = []
+
+    def slow_kpis(snap, params):
+        calls.append(params)
+        time.sleep(0.3)
+        return pd.DataFrame({'rows': [snap.rows]})
+
+    monkeypatch.setitem(service.QUERIES, '/kpis', slow_kpis)
+
+    async def test(port, _):
+        return await asyncio.gather(*[get('127.0.0.1', port, '/kpis?by=Country') for _ in range(10)])
+
+    responses = _serve(workbook, test)
+    assert len(calls) == 1
+    assert all(r == (200, [{'rows': 700}]) for r in responses)
+
+
+def test_reload_swaps_the_generation_after_a_file_change(workbook):
+    async def test(port, _):
+        before = await get('127.0.0.1', port, '/health')
+        unchanged = await get('127.0.0.1', port, '/reload', method='POST')
+        wb = load_workbook(workbook)
+        wb.worksheets[0].delete_rows(102, 1000)  # keep the header and 100 rows
+        wb.save(workbook)
+        changed = await get('127.0.0.1', port, '/reload', method='POST')
+        after = await get('127.0.0.1', port, '/health')
+        return before, unchanged, changed, after
+
+    before, unchanged, changed, after = _serve(workbook, test)
+    assert before[1]['generation'] == 0 and before[1]['rows'] == 700
+    assert unchanged == (200, {'reloaded': False, 'generation': 0})
+    assert changed == (200, {'reloaded': True, 'generation': 1})
+    assert after[1]['rows'] == 100
+
+
+@pytest.mark.parametrize('target, status', [
+    ('/slice?by=Nope', 400),
+    ('/slice?measure=Nope', 400),
+    ('/slice?stat=median', 400),
+    ('/slice?by=Country&Year=twenty', 400),
+    ('/elasticity?window=six', 400),
+    ('/elasticity?optimal=1&column=nope', 400),
+    ('/nope', 404),
+])
+def test_bad_queries(workbook, target, status):
+    async def test(port, _):
+        return await get('127.0.0.1', port, target)
+
+    got, body = _serve(workbook, test)
+    assert got == status
+    assert 'error' in body
@@ -0,0 +1,33 @@
+import pandas as pd
+import pytest
+
+from profit_analysis.store import Store, filter_rows
+
+COLUMNS = ['Country', 'Product', 'Year', 'Month Number', 'Sales', 'Profit']
+
+
+@pytest.fixture(scope='module')
+def store(tmp_path_factory, transactions):
+    return Store.write(transactions, str(tmp_path_factory.mktemp('store')))
+
+
+@pytest.mark.parametrize('query', [
+    {'where': {'Country': 'Canada'}, 'last': 3},
+    {'where': {'Product': ['VTT', 'Paseo'], 'Year': 2014}},
+    {'since': '2014-03', 'until': '2014-05'},
+])
+def test_read_matches_in_memory_filter(store, transactions, query):
+    got = store.read(COLUMNS, **query)
+    expected = filter_rows(transactions, **query)[COLUMNS]
+    key = ['Year', 'Month Number', 'Country', 'Product', 'Sales']
+    got = got.sort_values(key, ignore_index=True)
+    expected = expected.sort_values(key, ignore_index=True)
+    pd.testing.assert_frame_equal(got, expected, check_dtype=False, check_categorical=False)
+
+
+@pytest.mark.parametrize('last', [0, -1])
+def test_last_below_one_is_rejected(store, transactions, last):
+    with pytest.raises(ValueError):
+        store.read(COLUMNS, last=last)
+    with pytest.raises(ValueError):
+        filter_rows(transactions, last=last)
@@ -0,0 +1,41 @@
+import shutil
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from profit_analysis.pipeline import dedup, monthly_sums
+from profit_analysis.stream import stream_aggregates
+
+
+def _same(streamed, in_memory):
+    streamed = streamed.reset_index(drop=True)
+    in_memory = in_memory.reset_index(drop=True)
+    pd.testing.assert_frame_equal(streamed, in_memory, check_dtype=False, check_categorical=False)
+
+
+def test_stream_matches_in_memory(sample, transactions):
+    new_df, monthly = stream_aggregates(sample, chunksize=97)
+    expected = dedup(transactions)
+    _same(new_df, expected)
+    _same(monthly, monthly_sums(expected))
+
+
+def test_stream_reads_the_first_sheet(tmp_path, sample, transactions):
+    wb = load_workbook(sample)
+    wb.create_sheet('notes').append(['not', 'transactions'])
+    wb.active = 1
+    path = tmp_path / 'active-sheet.xlsx'
+    wb.save(path)
+    new_df, _ = stream_aggregates(str(path))
+    _same(new_df, dedup(transactions))
+
+
+def test_xls_is_read_in_one_chunk(tmp_path, monkeypatch, sample, transactions):
+    from profit_analysis import ingest
+
+    path = tmp_path / 'legacy.xls'
+    shutil.copy(sample, path)
+    # no xlrd here: read the xlsx content behind the .xls name with openpyxl
+    monkeypatch.setitem(ingest.READERS, '.xls', lambda p: pd.read_excel(open(p, 'rb'), engine='openpyxl'))
+    new_df, _ = stream_aggregates(str(tmp_path))
+    _same(new_df, dedup(transactions))
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from profit_analysis.schema import DEDUP_KEY, optimise
+from profit_analysis.validation import counts, validate
+
+
+@pytest.fixture
+def planted(transactions):
+    """The sample with three duplicated rows appended, one COGS a cent off and one Gross Sales a cent off."""
+    df = pd.concat([transactions, transactions.iloc[[3, 10, 10]]], ignore_index=True)
+    df.loc[5, 'COGS'] += 0.01
+    df.loc[7, 'Gross Sales'] += 0.01
+    return df
+
+
+@pytest.mark.parametrize('frame', ['transactions', 'planted'])
+def test_duplicates_match_pandas(request, frame):
+    df = request.getfixturevalue(frame)
+    result = validate(df, block=100)
+    np.testing.assert_array_equal(result['duplicates'], np.flatnonzero(df.duplicated()))
+    np.testing.assert_array_equal(result['key_duplicates'], np.flatnonzero(df.duplicated(subset=DEDUP_KEY, keep=False)))
+
+
+def test_planted_duplicates_are_found(transactions, planted):
+    assert len(validate(planted)['duplicates']) == len(validate(transactions)['duplicates']) + 3
+
+
+def test_a_cent_off_is_flagged_rounding_noise_is_not(transactions, planted):
+    baseline = validate(transactions, ['gross_sales', 'cogs'])
+    result = validate(planted, ['gross_sales', 'cogs'])
+    assert sorted(set(result['cogs']) - set(baseline['cogs'])) == [5]
+    assert sorted(set(result['gross_sales']) - set(baseline['gross_sales'])) == [7]
+
+    noisy = transactions.copy()
+    for c in ['Gross Sales', 'COGS']:
+        noisy[c] = noisy[c] * (1 + 1e-12) + 1e-9  # float noise, far below a cent
+    noisy_result = validate(noisy, ['gross_sales', 'cogs'])
+    for rule in baseline:
+        np.testing.assert_array_equal(noisy_result[rule], baseline[rule])
+
+
+def test_cents_give_the_same_counts(planted):
+    pd.testing.assert_series_equal(counts(validate(optimise(planted, money='cents'))), counts(validate(planted)))
+
+
+def test_large_cents_stay_int64(planted):
+    assert optimise(planted, money='cents')['Sales'].dtype == 'int32'
+    big = planted.copy()
+    big.loc[0, 'Sales'] = 3e7  # 3 billion cents
+    assert optimise(big, money='cents')['Sales'].dtype == 'int64'
+    pd.testing.assert_series_equal(counts(validate(optimise(big, money='cents'))), counts(validate(big)))
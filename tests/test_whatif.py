@@ -0,0 +1,60 @@
+import numpy as np
+
+from profit_analysis.whatif import MEASURES, Simulator, bin_codes
+
+POLICIES = [
+    {'cap': 5},
+    {'cap': 3, 'Product': 'VTT', 'Country': 'Canada'},
+    {'cap': 8, 'Segment': ['Enterprise', 'Government'], 'name': 'B2G'},
+    {'cap': 0, 'Country': 'Nowhere'},
+]
+
+
+def _brute_force(df, policy, units_per_point):
+    """Totals per (Country, bin) after capping every matching row, one row at a time."""
+    out = {}
+    k = units_per_point / 100
+    for row in df.to_dict('records'):
+        gross, discounts = row['Gross Sales'], row['Discounts']
+        ratio = discounts / gross * 100 if gross else 0.0
+        values = {m: row[m] for m in MEASURES}
+        applies = all(row[d] in ([v] if isinstance(v, str) else v) for d, v in policy.items() if d not in ('cap', 'name'))
+        if applies and ratio > policy['cap']:
+            scale = 1 + k * (policy['cap'] - ratio)
+            for m in ['Units Sold', 'Gross Sales', 'COGS']:
+                values[m] = row[m] * scale
+            values['Discounts'] = values['Gross Sales'] * policy['cap'] / 100
+            values['Sales'] = values['Gross Sales'] - values['Discounts']
+            values['Profit'] = values['Sales'] - values['COGS']
+        key = (row['Country'], int(bin_codes(np.array([ratio]))[0]))
+        totals = out.setdefault(key, dict.fromkeys(MEASURES, 0.0))
+        for m in MEASURES:
+            totals[m] += values[m]
+    return out
+
+
+def _check(transactions, units_per_point):
+    sim = Simulator(transactions)
+    result = sim.simulate(POLICIES, by='Country', units_per_point=units_per_point)
+    for name, policy in zip(result['Policy'].unique(), POLICIES):
+        got = result[result['Policy'] == name]
+        expected = _brute_force(transactions, policy, units_per_point)
+        assert len(got) == len(expected)
+        for row in got.to_dict('records'):
+            totals = expected[(row['Country'], list(got['bins'].cat.categories).index(row['bins']))]
+            for m in MEASURES:
+                assert abs(row[m] - totals[m]) <= 1e-8 * max(1.0, abs(totals[m])), (name, m)
+
+
+def test_caps_match_brute_force(transactions):
+    _check(transactions, 0.0)
+
+
+def test_volume_response_matches_brute_force(transactions):
+    _check(transactions, 2.0)
+
+
+def test_no_policy_change_for_unmatched_rows(transactions):
+    result = Simulator(transactions).simulate([{'cap': 0, 'Country': 'Nowhere'}])
+    assert np.allclose(result['Profit change'], 0)
+    assert np.isclose(result['Profit'].sum(), transactions['Profit'].sum())